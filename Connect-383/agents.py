@@ -3,6 +3,52 @@ import math
 
 BOT_NAME = "sudo rm -rf /*"  # jk lol
 
+TABLE_SIZE = 1 << 18  # default number of transposition table slots
+EXACT, LOWER, UPPER = 0, 1, 2  # transposition table entry types: the value, or a bound on it
+
+
+class TranspositionTable:
+    """Fixed-size table of minimax results, indexed by GameState.zobrist().
+
+    Each slot holds one (key, depth, value, flag, search) entry, where depth is the depth limit
+    left when the state was searched and flag says whether value is EXACT or a LOWER or UPPER
+    bound.  A new entry replaces the slot's old one if the old one is from an earlier search
+    (get_move call), is for the same state, or was searched less deeply: deeper results are the
+    expensive ones to redo.
+    """
+
+    def __init__(self, size=TABLE_SIZE):
+        self.size = size
+        self._slots = [None] * size
+        self._search = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        """Start a new search: older entries become replaceable and the hit counts restart."""
+        self._search += 1
+        self.probes = 0
+        self.hits = 0
+
+    def lookup(self, key, depth):
+        """Return (value, flag) for a state searched to exactly this depth, or None."""
+        self.probes += 1
+        entry = self._slots[key % self.size]
+        if entry is not None and entry[0] == key and entry[1] == depth:
+            self.hits += 1
+            return entry[2], entry[3]
+        return None
+
+    def store(self, key, depth, value, flag):
+        index = key % self.size
+        entry = self._slots[index]
+        if entry is None or entry[4] != self._search or entry[0] == key or depth >= entry[1]:
+            self._slots[index] = (key, depth, value, flag, self._search)
+
+    def hit_rate(self):
+        """Fraction of lookups since new_search() that found an entry."""
+        return self.hits / self.probes if self.probes else 0.0
+
 
 class RandomAgent:
     """Agent that picks a random available move.  You should be able to beat it."""
@@ -91,8 +137,18 @@ class MinimaxAgent:
 class MinimaxHeuristicAgent(MinimaxAgent):
     """Artificially intelligent agent that uses depth-limited minimax to select the best move."""
 
-    def __init__(self, depth_limit):
+    def __init__(self, depth_limit, table_size=TABLE_SIZE):
+        """Args:
+            depth_limit: how many moves deep to search before using evaluation()
+            table_size: slots in the transposition table (0 to search without one)
+        """
         self.depth_limit = depth_limit
+        self.table = TranspositionTable(table_size) if table_size else None
+
+    def get_move(self, state):
+        if self.table is not None:
+            self.table.new_search()
+        return super().get_move(state)
 
     def minimax(self, state):
         """Determine the heuristically estimated minimax utility value of the given state.
@@ -102,28 +158,43 @@ class MinimaxHeuristicAgent(MinimaxAgent):
         function.  If depth is 0, no traversal is performed, and minimax returns the results of 
         a call to evaluation().  If depth is None, the entire game tree is traversed.
 
+        Values are looked up in and saved to the transposition table (if there is one), keyed by
+        the state and the depth left, so positions reached by different move orders are only
+        searched once.
+
         Args:
             state: a connect383.GameState object representing the current board
 
         Returns: the minimax utility value of the state
         """
+        table = self.table
 
         def maxValue(state, depth):
+            entry = table.lookup(state.zobrist(), depth) if table is not None else None
+            if entry is not None:
+                return entry[0]
             if state.is_full() or depth == 0:
                 v = self.evaluation(state)
             else:
                 v = float('-inf')  # https://www.geeksforgeeks.org/python-infinity/
                 for move, s in state.successors():
                     v = max(v, minValue(s, depth-1))
+            if table is not None:
+                table.store(state.zobrist(), depth, v, EXACT)
             return v
 
         def minValue(state, depth):
+            entry = table.lookup(state.zobrist(), depth) if table is not None else None
+            if entry is not None:
+                return entry[0]
             if state.is_full() or depth == 0:
                 v = self.evaluation(state)
             else:
                 v = float('inf')
                 for move, s in state.successors():
                     v = min(v, maxValue(s, depth-1))
+            if table is not None:
+                table.store(state.zobrist(), depth, v, EXACT)
             return v
 
         if state.is_full() or self.depth_limit == 0:
@@ -139,7 +210,8 @@ class MinimaxHeuristicAgent(MinimaxAgent):
 
         """Estimate the utility value of the game state based on features.
 
-        N.B.: This method must run in O(1) time!
+        N.B.: This method must run in O(1) time!  The line values are cached on the state (see
+        GameState.line_values()), so only the four lines through the last piece are rescored.
 
         Args:
             state: a connect383.GameState object representing the current board
@@ -147,61 +219,16 @@ class MinimaxHeuristicAgent(MinimaxAgent):
         Returns: a heusristic estimate of the utility value of the state
         """
 
-        def lineCalc(state_thing):
-            value = 0
-            for line in state_thing:
-                streak = streaks(line)  # streak is list of tuples (value, streak)
-                for i in range(len(streak) - 1):
-                    # check for "gap" between streak
-                    current_streak_value = streak[i][0]
-                    current_streak_length = streak[i][1]
-                    prev_streak_value = streak[i - 1][0]
-                    prev_streak_length = streak[i - 1][1]
-                    next_streak_value = streak[i + 1][0]
-                    next_streak_length = streak[i + 1][1]
-                    if (current_streak_value == 0 and current_streak_length == 1 and (abs(prev_streak_value) == 1) and (
-                            prev_streak_value == next_streak_value)):
-                        connector_value = prev_streak_value * (
-                                    prev_streak_length + next_streak_length + 1) ** 2  # score if completed
-                        if prev_streak_length > 2:
-                            connector_value -= prev_streak_value * prev_streak_length ** 2
-                        if next_streak_length > 2:
-                            connector_value -= next_streak_value * next_streak_length ** 2
-                        value += connector_value
-                    # if there was a streak that got blocked by the other player
-                    if (current_streak_length >= 2) & (current_streak_value == -1 * next_streak_value):
-                        block_value = next_streak_value * (
-                                    current_streak_length + 1) ** 2  # the blocker's player times the length of the streak that was prevented
-                        if current_streak_length > 2:  # don't subtract if blocked a potential 3
-                            block_value -= next_streak_value * current_streak_length ** 2
-                        value += block_value
-                    # if there is a streak
-                    if current_streak_length > 2:
-                        value += current_streak_value * current_streak_length ** 2
-                if streak[-1][1] > 2:
-                    value += streak[-1][0] * streak[-1][1] ** 2
-            return value
-
-        def centerScore(state_rows, state_cols):  # preference to middle values
-            center_value = 0
-
-            for i in range(len(state_rows)):
-                counter = 0
-                for j in state_rows[i]:
-                    center_value += j * (-1 * abs(counter - int(len(state_rows) / 2)) + int(len(state_rows) / 2)) # slight preference towards middle (triangle, higher values towards middle)
-                    counter += 1
-            return center_value
-
-        state_rows = state.get_rows()
-        state_cols = state.get_cols()
-        state_diags = state.get_diags()
-
-        row_value = lineCalc(state_rows)
-        col_value = lineCalc(state_cols)
-        diag_value = lineCalc(state_diags)
-        center_value = centerScore(state_rows, state_cols)
-
-        eval = row_value + col_value + diag_value + center_value
+        line_value = sum(state.line_values('evaluation', lineValue))
+
+        # preference to middle values (triangle, higher values towards middle); the peak is at
+        # num_rows // 2
+        middle = state.num_rows // 2
+        center_value = 0
+        for j, column_sum in enumerate(state.column_sums()):
+            center_value += column_sum * (-1 * abs(j - middle) + middle)
+
+        eval = line_value + center_value
 
         return eval
 
@@ -222,15 +249,47 @@ class MinimaxHeuristicPruneAgent(MinimaxHeuristicAgent):
         the state reached by moving to column 4 before you've explored the state reached by a move
         to to column 1.
 
+        With a transposition table, a state already searched to the same depth either returns its
+        stored value or, if only a bound was stored (the search was cut off), narrows the
+        alpha-beta window.  Cut-off searches store their value as a bound, so the result is still
+        the exact depth-limited minimax value.
+
         Args: 
             state: a connect383.GameState object representing the current board
 
         Returns: the minimax utility value of the state
         """
+        table = self.table
+
+        def probe(state, depth, alpha, beta):
+            # (value or None, alpha, beta) after consulting the table
+            entry = table.lookup(state.zobrist(), depth) if table is not None else None
+            if entry is not None:
+                value, flag = entry
+                if flag == EXACT:
+                    return value, alpha, beta
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if beta <= alpha:
+                    return value, alpha, beta
+            return None, alpha, beta
+
+        def save(state, depth, v, alpha, beta):
+            # v is exact inside the (alpha, beta) window it was searched with, a bound outside it
+            if table is not None:
+                flag = UPPER if v <= alpha else LOWER if v >= beta else EXACT
+                table.store(state.zobrist(), depth, v, flag)
 
         def maxValue(state, depth, alpha, beta):
+            value, alpha, beta = probe(state, depth, alpha, beta)
+            if value is not None:
+                return value
+            window = alpha, beta
             if state.is_full() or depth == 0:
                 v = self.evaluation(state)
+                window = float('-inf'), float('inf')  # evaluation() is always exact
             else:
                 v = float('-inf')  # https://www.geeksforgeeks.org/python-infinity/
                 for move, s in state.successors():
@@ -238,11 +297,17 @@ class MinimaxHeuristicPruneAgent(MinimaxHeuristicAgent):
                     alpha = max(v, alpha)
                     if beta <= alpha:
                         break
+            save(state, depth, v, *window)
             return v
 
         def minValue(state, depth, alpha, beta):
+            value, alpha, beta = probe(state, depth, alpha, beta)
+            if value is not None:
+                return value
+            window = alpha, beta
             if state.is_full() or depth == 0:
                 v = self.evaluation(state)
+                window = float('-inf'), float('inf')
             else:
                 v = float('inf')
                 for move, s in state.successors():
@@ -250,6 +315,7 @@ class MinimaxHeuristicPruneAgent(MinimaxHeuristicAgent):
                     beta = min(v, beta)
                     if beta <= alpha:
                         break
+            save(state, depth, v, *window)
             return v
 
         alpha = float('-inf')
@@ -265,6 +331,42 @@ class MinimaxHeuristicPruneAgent(MinimaxHeuristicAgent):
         return v
 
 
+def lineValue(line):
+    """Heuristic value of one row, column or diagonal for MinimaxHeuristicAgent.evaluation()."""
+    value = 0
+    streak = streaks(line)  # streak is list of tuples (value, streak)
+    for i in range(len(streak) - 1):
+        # check for "gap" between streak
+        current_streak_value = streak[i][0]
+        current_streak_length = streak[i][1]
+        prev_streak_value = streak[i - 1][0]
+        prev_streak_length = streak[i - 1][1]
+        next_streak_value = streak[i + 1][0]
+        next_streak_length = streak[i + 1][1]
+        if (current_streak_value == 0 and current_streak_length == 1 and (abs(prev_streak_value) == 1) and (
+                prev_streak_value == next_streak_value)):
+            connector_value = prev_streak_value * (
+                        prev_streak_length + next_streak_length + 1) ** 2  # score if completed
+            if prev_streak_length > 2:
+                connector_value -= prev_streak_value * prev_streak_length ** 2
+            if next_streak_length > 2:
+                connector_value -= next_streak_value * next_streak_length ** 2
+            value += connector_value
+        # if there was a streak that got blocked by the other player
+        if (current_streak_length >= 2) & (current_streak_value == -1 * next_streak_value):
+            block_value = next_streak_value * (
+                        current_streak_length + 1) ** 2  # the blocker's player times the length of the streak that was prevented
+            if current_streak_length > 2:  # don't subtract if blocked a potential 3
+                block_value -= next_streak_value * current_streak_length ** 2
+            value += block_value
+        # if there is a streak
+        if current_streak_length > 2:
+            value += current_streak_value * current_streak_length ** 2
+    if streak[-1][1] > 2:
+        value += streak[-1][0] * streak[-1][1] ** 2
+    return value
+
+
 def streaks(lst):  # taken from connect383.py
     """Get the lengths of all the streaks of the same element in a sequence."""
     rets = []  # list of (element, length) tuples
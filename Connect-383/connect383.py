@@ -1,9 +1,57 @@
 import sys
 import argparse
+import random
 from agents import RandomAgent, HumanAgent, MinimaxAgent, MinimaxHeuristicAgent, MinimaxHeuristicPruneAgent
+from agents import TABLE_SIZE
 import test_boards
 
 
+_zobrist_tables = {}  # (rows, cols) -> Zobrist keys for Player 1, Player 2 and obstacles
+_line_layouts = {}  # (rows, cols) -> bit positions of every line, and the lines through each bit
+
+
+def zobrist_keys(num_rows, num_cols):
+    """Return the Zobrist keys for a board size: three lists of random 64-bit ints (for Player 1's
+    pieces, Player 2's pieces and obstacles), indexed by bit position as in GameState.
+
+    Keys come from a fixed seed, so hashes are the same from run to run.
+    """
+    if (num_rows, num_cols) not in _zobrist_tables:
+        rng = random.Random("connect383-{}x{}".format(num_rows, num_cols))
+        bits = (num_rows + 1) * num_cols
+        _zobrist_tables[num_rows, num_cols] = tuple([rng.getrandbits(64) for _ in range(bits)]
+                                                    for _ in range(3))
+    return _zobrist_tables[num_rows, num_cols]
+
+
+def line_layout(num_rows, num_cols):
+    """Return the lines of a board size: (lines, through).
+
+    lines lists every row, column and diagonal as a tuple of bit positions (see GameState), in the
+    order and direction of get_rows() + get_cols() + get_diags().  through[i] holds the indices
+    into lines of the row, column and two diagonals that pass through bit position i.
+    """
+    if (num_rows, num_cols) not in _line_layouts:
+        stride = num_rows + 1
+        rows = [tuple(c * stride + r for c in range(num_cols)) for r in range(num_rows)]
+        cols = [tuple(c * stride + r for r in range(num_rows)) for c in range(num_cols)]
+        # diagonal j holds the squares with c - r == j - (num_rows - 1) (forwards) or
+        # c + r == j (backs), bottom row first
+        forwards = [tuple(c * stride + r for r in range(num_rows)
+                          for c in [j - num_rows + 1 + r] if 0 <= c < num_cols)
+                    for j in range(num_rows + num_cols - 1)]
+        backs = [tuple(c * stride + r for r in range(num_rows)
+                       for c in [j - r] if 0 <= c < num_cols)
+                 for j in range(num_rows + num_cols - 1)]
+        lines = rows + cols + forwards + backs
+        through = [[] for _ in range(stride * num_cols)]
+        for number, line in enumerate(lines):
+            for index in line:
+                through[index].append(number)
+        _line_layouts[num_rows, num_cols] = lines, [tuple(numbers) for numbers in through]
+    return _line_layouts[num_rows, num_cols]
+
+
 class GameState:
     """Class representing a single state of a Connect 4-esque game.
 
@@ -12,8 +60,17 @@ class GameState:
     Once created, a game state object should usually not be modified; instead, use the successors()
     function to generate reachable states.
 
-    The board is stored as a 2D list, containing 1's representing Player 1's pieces and -1's
-    for Player 2 (unused spaces are 0, and "obstacles" are -2).
+    The board is stored as bitboards: one int mask each for Player 1's pieces, Player 2's pieces
+    and "obstacles", where bit c * (num_rows + 1) + r stands for row r (counting from the bottom)
+    of column c.  The board attribute gives the same board as a 2D tuple, containing 1's
+    representing Player 1's pieces and -1's for Player 2 (unused spaces are 0, and obstacles
+    are -2); it is built from the masks the first time it is used.
+
+    Each state also carries a Zobrist hash (the XOR of a random key per occupied square, see
+    zobrist_keys()), updated with a single XOR per move.
+
+    Per-line values (see line_values()) are cached on the state, and a successor works its values
+    out from its parent's by rescoring only the four lines through the new piece.
     """
     
     state_count = 0  # bookkeeping to help track how efficient agents' search methods are running
@@ -27,18 +84,65 @@ class GameState:
         """
         if len(args) == 2:
             r, c = args
-            self.num_rows = r
-            self.num_cols = c
-            self.board = tuple([ tuple([0]*self.num_cols) ]*self.num_rows)  
+            board = [[0] * c] * r
         else:
             board = args[0]
-            self.num_rows = len(board)
-            self.num_cols = len(board[0])
-            self.board = tuple([ tuple(board[r]) for r in range(self.num_rows) ])
-
-        # 1 for Player 1, -1 for Player 2
-        self._next_p = 1 if (sum(sum(row) for row in self.board) % 2) == 0 else -1  
-        self._moves_left = sum(sum([1 if x == 0 else 0 for x in row]) for row in self.board)
+        self.num_rows = len(board)
+        self.num_cols = len(board[0])
+        self._stride = self.num_rows + 1  # bits per column; the top one is always clear
+        self._column_mask = (1 << self.num_rows) - 1
+
+        self._keys = zobrist_keys(self.num_rows, self.num_cols)
+        self._layout = line_layout(self.num_rows, self.num_cols)
+        self._p1 = self._p2 = self._obstacles = 0
+        self._zobrist = 0
+        pieces = 0
+        self._moves_left = 0
+        for r in range(self.num_rows):
+            for c in range(self.num_cols):
+                index = c * self._stride + r
+                if board[r][c] == 1:
+                    self._p1 |= 1 << index
+                    self._zobrist ^= self._keys[0][index]
+                    pieces += 1
+                elif board[r][c] == -1:
+                    self._p2 |= 1 << index
+                    self._zobrist ^= self._keys[1][index]
+                    pieces += 1
+                elif board[r][c] == -2:
+                    self._obstacles |= 1 << index
+                    self._zobrist ^= self._keys[2][index]
+                else:
+                    self._moves_left += 1
+        self._board = None
+        self._parent = None  # the state this one was created from, and the bit of the new piece
+        self._last = None
+        self._line_cache = {}  # key -> list of per-line values, see line_values()
+
+        # 1 for Player 1, -1 for Player 2 (obstacles count -2 each, so they don't change whose
+        # turn it is)
+        self._next_p = 1 if pieces % 2 == 0 else -1
+
+    @property
+    def board(self):
+        """The board as a tuple of rows (bottom row first), each a tuple of 1, -1, 0 or -2."""
+        if self._board is None:
+            rows = []
+            for r in range(self.num_rows):
+                row = []
+                for c in range(self.num_cols):
+                    bit = 1 << (c * self._stride + r)
+                    if self._p1 & bit:
+                        row.append(1)
+                    elif self._p2 & bit:
+                        row.append(-1)
+                    elif self._obstacles & bit:
+                        row.append(-2)
+                    else:
+                        row.append(0)
+                rows.append(tuple(row))
+            self._board = tuple(rows)
+        return self._board
 
     def next_player(self):
         """Determines who's move it is based on the board state.
@@ -51,17 +155,40 @@ class GameState:
         """Checks to see if there are available moves left."""
         return self._moves_left <= 0
 
+    def height(self, col):
+        """Return the row the next piece dropped in a column lands in (num_rows if it is full)."""
+        occupied = self._p1 | self._p2 | self._obstacles
+        column = (occupied >> (col * self._stride)) & self._column_mask
+        return (~column & (column + 1)).bit_length() - 1  # the lowest empty row
+
     def _create_successor(self, col):
         """Create the successor state that follows from a given move."""
 
-        successor_board = [ list(row) for row in self.board ]
-        row = 0
-        while (successor_board[row][col] != 0):
-            row += 1
+        row = self.height(col)
         if row >= self.num_rows:
             raise Exception("Illegal successor: {}, {}".format(col, self.board))
-        successor_board[row][col] = self._next_p
-        successor = GameState(successor_board)
+        index = col * self._stride + row
+        bit = 1 << index
+        successor = GameState.__new__(GameState)  # only the new piece changes, so skip __init__
+        successor.num_rows = self.num_rows
+        successor.num_cols = self.num_cols
+        successor._stride = self._stride
+        successor._column_mask = self._column_mask
+        successor._keys = self._keys
+        successor._layout = self._layout
+        if self._next_p == 1:
+            successor._p1, successor._p2 = self._p1 | bit, self._p2
+            successor._zobrist = self._zobrist ^ self._keys[0][index]
+        else:
+            successor._p1, successor._p2 = self._p1, self._p2 | bit
+            successor._zobrist = self._zobrist ^ self._keys[1][index]
+        successor._obstacles = self._obstacles
+        successor._moves_left = self._moves_left - 1
+        successor._next_p = -self._next_p
+        successor._board = None
+        successor._parent = self
+        successor._last = index
+        successor._line_cache = {}
         GameState.state_count += 1
         return successor
 
@@ -71,8 +198,10 @@ class GameState:
         Returns: a _sorted_ list of (move, state) tuples
         """
         move_states = []
+        occupied = self._p1 | self._p2 | self._obstacles
+        top = 1 << (self.num_rows - 1)
         for col in range(self.num_cols):
-            if self.board[self.num_rows-1][col] == 0:
+            if not (occupied >> (col * self._stride)) & top:
                 move_states.append((col, self._create_successor(col)))        
         return move_states
 
@@ -97,6 +226,46 @@ class GameState:
         backs = [[c for c in r if c is not None] for r in zip(*grid_back)]
         return forwards + backs
 
+    def line(self, number):
+        """Return line number `number` of line_layout() (a row, column or diagonal) as a list of
+        1, -1, 0 or -2, the same as the matching entry of get_rows() + get_cols() + get_diags()."""
+        p1, p2, obstacles = self._p1, self._p2, self._obstacles
+        return [1 if p1 >> i & 1 else -1 if p2 >> i & 1 else -2 if obstacles >> i & 1 else 0
+                for i in self._layout[0][number]]
+
+    def line_values(self, key, score_line):
+        """Return [score_line(line) for every row, column and diagonal], in line_layout() order.
+
+        The list is cached on the state under key.  A successor builds its list from its parent's,
+        calling score_line only for the lines through the new piece, so score_line must depend on
+        nothing but the line it is given, and every caller using a key must pass the same function.
+        """
+        if key in self._line_cache:
+            return self._line_cache[key]
+        chain = [self]  # states without values, newest first, back to one whose parent has them
+        while chain[-1]._parent is not None and key not in chain[-1]._parent._line_cache:
+            chain.append(chain[-1]._parent)
+        if chain[-1]._parent is None:
+            state = chain.pop()
+            state._line_cache[key] = [score_line(state.line(number))
+                                      for number in range(len(state._layout[0]))]
+        for state in reversed(chain):
+            values = list(state._parent._line_cache[key])
+            for number in state._layout[1][state._last]:
+                values[number] = score_line(state.line(number))
+            state._line_cache[key] = values
+        return self._line_cache[key]
+
+    def column_sums(self):
+        """Return the sum of the squares (1, -1, 0 or -2) in each column, counted from the masks."""
+        sums = []
+        for c in range(self.num_cols):
+            shift = c * self._stride
+            sums.append(bin(self._p1 >> shift & self._column_mask).count('1') -
+                        bin(self._p2 >> shift & self._column_mask).count('1') -
+                        2 * bin(self._obstacles >> shift & self._column_mask).count('1'))
+        return sums
+
     def scores(self):
         """Calculate the score for each player.
         
@@ -105,12 +274,9 @@ class GameState:
         """
         p1_score = 0
         p2_score = 0
-        for run in self.get_rows() + self.get_cols() + self.get_diags():
-            for elt, length in streaks(run):
-                if (elt == 1) and (length >= 3):
-                    p1_score += length**2
-                elif (elt == -1) and (length >= 3):
-                    p2_score += length**2
+        for s1, s2 in self.line_values('scores', line_scores):
+            p1_score += s1
+            p2_score += s2
         return p1_score, p2_score
 
     def utility(self):
@@ -122,6 +288,18 @@ class GameState:
         s1, s2 = self.scores()
         return s1 - s2
 
+    def __eq__(self, other):
+        return (isinstance(other, GameState) and self.num_rows == other.num_rows and
+                self.num_cols == other.num_cols and self._p1 == other._p1 and
+                self._p2 == other._p2 and self._obstacles == other._obstacles)
+
+    def zobrist(self):
+        """Return the state's 64-bit Zobrist hash."""
+        return self._zobrist
+
+    def __hash__(self):
+        return self._zobrist
+
     def __str__(self):
         symbols = { -1: "O", 1: "X", 0: "-", -2: "#" }
         s = ""
@@ -153,6 +331,18 @@ def streaks(lst):
     return rets
 
 
+def line_scores(run):
+    """Return the points (see GameState.scores()) each player gets for a single line."""
+    p1_score = 0
+    p2_score = 0
+    for elt, length in streaks(run):
+        if (elt == 1) and (length >= 3):
+            p1_score += length**2
+        elif (elt == -1) and (length >= 3):
+            p2_score += length**2
+    return p1_score, p2_score
+
+
 def play_game(player1, player2, state):
     """Run a Connect383 game.
 
@@ -179,6 +369,9 @@ def play_game(player1, player2, state):
 
         print("Turn {}:".format(turn))        
         print("Player {} generated {} states".format(1 if state.next_player() == 1 else 2, states_created))
+        if getattr(player, 'table', None) is not None:
+            print("Transposition table hit rate: {:.1%} of {} lookups".format(
+                player.table.hit_rate(), player.table.probes))
         print("Player {} moves to column {}".format(1 if state.next_player() == 1 else 2, move))
         print(state_next)
         print("Current score is:", state_next.scores(), "\n\n")
@@ -211,6 +404,8 @@ if __name__ == "__main__":
     parser.add_argument('--prune', action='store_true')
     parser.add_argument('--depth', type=int)
     parser.add_argument('--board', choices=test_boards.boards.keys())
+    parser.add_argument('--table-size', type=int, default=TABLE_SIZE,
+                        help="transposition table slots for depth-limited agents (0 for none)")
     args = parser.parse_args()
     # print("args:", args)  
 
@@ -225,9 +420,9 @@ if __name__ == "__main__":
                 player = MinimaxAgent()
             else:
                 if not args.prune:
-                    player = MinimaxHeuristicAgent(args.depth)
+                    player = MinimaxHeuristicAgent(args.depth, args.table_size)
                 else:
-                    player = MinimaxHeuristicPruneAgent(args.depth)
+                    player = MinimaxHeuristicPruneAgent(args.depth, args.table_size)
         players.append(player)            
 
     if args.board:
@@ -0,0 +1,93 @@
+"""Micro-benchmark for the pdqpq priority queues.
+
+Replays the same seeded mix of adds, priority decreases and pops against each queue class, the
+way uniform-cost and A* searches use their frontiers, and reports the time taken and how many
+entries the queue's internal storage ended up holding compared to the live task count.
+
+Usage: python bench_pdqpq.py [num_tasks] [seed]
+"""
+import heapq
+import random
+import sys
+import time
+
+import pdqpq
+
+QUEUE_CLASSES = [pdqpq.PriorityQueue, pdqpq.BucketPriorityQueue, pdqpq.IndexedPriorityQueue]
+
+
+def make_workload(num_tasks, seed):
+    """Build a list of ('add', task, priority) and ('pop',) operations.
+
+    Each popped task pushes a handful of new tasks at slightly higher priorities; about a third
+    of those pushes revisit a task already queued with a lower priority (a decrease-key).
+    """
+    rng = random.Random(seed)
+    ops = []
+    queued = {}  # task -> priority, mirroring what the queue should hold
+    order = []  # heap of (priority, add number, task); stale triples are skipped when popped
+
+    def add(task, priority):
+        queued[task] = priority
+        heapq.heappush(order, (priority, len(ops), task))  # ties pop in insertion order
+        ops.append(('add', task, priority))
+
+    add(0, 0)
+    next_task = 1
+    while queued:
+        ops.append(('pop',))
+        floor, _, task = heapq.heappop(order)
+        while queued.get(task) != floor:
+            floor, _, task = heapq.heappop(order)
+        del queued[task]
+        for _ in range(rng.randint(1, 4)):
+            if rng.random() < 0.35:
+                other = rng.randrange(next_task)  # revisit an earlier task if it's still queued
+                if other in queued and queued[other] > floor:
+                    add(other, rng.randint(floor, queued[other] - 1))
+            elif next_task < num_tasks:
+                add(next_task, floor + rng.randint(1, 64))
+                next_task += 1
+    return ops
+
+
+def storage_size(queue):
+    # entries held internally, including stale ones left behind by updates
+    if isinstance(queue, pdqpq.BucketPriorityQueue):
+        return sum(len(bucket) for bucket in queue.buckets)
+    return len(queue.pq)
+
+
+def run(queue_class, ops):
+    """Time one pass over ops, then replay them to find the peak storage and live sizes."""
+    queue = queue_class()
+    start = time.perf_counter()
+    for op in ops:
+        if op[0] == 'add':
+            queue.add(op[1], op[2])
+        else:
+            queue.pop()
+    elapsed = time.perf_counter() - start
+
+    queue = queue_class()
+    peak_storage = 0
+    peak_live = 0
+    for op in ops:
+        if op[0] == 'add':
+            queue.add(op[1], op[2])
+            peak_storage = max(peak_storage, storage_size(queue))
+            peak_live = max(peak_live, len(queue))
+        else:
+            queue.pop()
+    return elapsed, peak_storage, peak_live
+
+
+if __name__ == '__main__':
+    num_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    workload = make_workload(num_tasks, seed)
+    print("{} operations on {} tasks".format(len(workload), num_tasks))
+    print("{:22} {:>10} {:>14} {:>10}".format("queue", "seconds", "peak storage", "peak live"))
+    for cls in QUEUE_CLASSES:
+        seconds, storage, live = run(cls, workload)
+        print("{:22} {:>10.3f} {:>14} {:>10}".format(cls.__name__, seconds, storage, live))
@@ -0,0 +1,182 @@
+"""Regression benchmarks for the solver strategies.
+
+Boards are drawn (with a fixed seed) from exact move-distance layers of a breadth-first search
+around the goal, so every run of the suite sees the same boards at the same optimal depths.  Each
+strategy is run on each board, recording its best-of-N wall time, node expansions, peak traced
+memory and path cost.  Results are written to a JSON baseline; compare mode re-runs (or loads) a
+second set of results and flags anything that got worse by more than a threshold percentage.
+
+Usage:
+    python benchmark.py run baseline.json [--depths 8,14,20] [--per-depth 2] [--seed 0]
+    python benchmark.py compare baseline.json [current.json] [--threshold 10]
+
+compare re-runs the baseline's boards and strategies when no current file is given, and exits
+with status 1 if it finds a regression.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+import puzz
+import solver
+
+DEFAULT_STRATEGIES = ['bfs', 'ucost', 'greedy-h1', 'greedy-h2', 'greedy-h3',
+                      'astar-h1', 'astar-h2', 'astar-h3']
+METRICS = ('time', 'expanded_count', 'peak_memory')  # lower is better; path_cost is checked too
+
+
+def boards_at_depths(depths, per_depth, seed, goal=solver.GOAL_STATE):
+    """Pick per_depth boards whose shortest solution is exactly d moves, for each d in depths.
+
+    Returns: a list of (depth, board string) pairs
+    """
+    rng = random.Random(seed)
+    layer = [goal]
+    seen = {goal}
+    layers = {0: [goal]}
+    for depth in range(1, max(depths) + 1):
+        next_layer = []
+        for board in layer:
+            for succ in board.successors().values():
+                if succ not in seen:
+                    seen.add(succ)
+                    next_layer.append(succ)
+        layer = next_layer
+        layers[depth] = layer
+    picked = []
+    for depth in depths:
+        # sort first so the sample only depends on the seed, not on set/dict ordering
+        candidates = sorted(str(board) for board in layers[depth])
+        for board in rng.sample(candidates, min(per_depth, len(candidates))):
+            picked.append((depth, board))
+    return picked
+
+
+def measure(board, strategy, repeat):
+    """Run one strategy on one board.
+
+    Returns: a dictionary with the best wall time over repeat runs, the expansion count, the
+        peak memory traced during one extra run, and the path cost (None if unsolved)
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = solver.solve_puzzle(puzz.make_board(board), strategy)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    solver.solve_puzzle(puzz.make_board(board), strategy)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'time': best,
+        'expanded_count': results['expanded_count'],
+        'peak_memory': peak,
+        'path_cost': results.get('path_cost'),
+    }
+
+
+def run_suite(boards, strategies, repeat=1, log=None):
+    """Benchmark every strategy on every board.
+
+    Args:
+        boards: list of (depth, board string) pairs
+        strategies: list of solve_puzzle strategy names
+        repeat: timing runs per board (the best time is kept)
+        log: optional file to print progress lines to
+
+    Returns: a JSON-friendly dictionary with the boards, strategies and per-run results
+    """
+    runs = []
+    for depth, board in boards:
+        for strategy in strategies:
+            record = {'board': board, 'depth': depth, 'strategy': strategy}
+            record.update(measure(board, strategy, repeat))
+            runs.append(record)
+            if log is not None:
+                print("{} (depth {}) {:10} {:8.3f}s {:>8} expanded {:>10} bytes cost {}".format(
+                    board, depth, strategy, record['time'], record['expanded_count'],
+                    record['peak_memory'], record['path_cost']), file=log)
+    return {'boards': [list(b) for b in boards], 'strategies': list(strategies),
+            'repeat': repeat, 'runs': runs}
+
+
+def compare(baseline, current, threshold, min_time=0.01):
+    """Find runs in current that are worse than baseline.
+
+    A run regresses when a metric in METRICS grew by more than threshold percent, or when its
+    path cost went up (or the board stopped being solved).  Times below min_time seconds are too
+    noisy to compare and are skipped.
+
+    Returns: a list of human-readable regression descriptions
+    """
+    old_runs = {(r['board'], r['strategy']): r for r in baseline['runs']}
+    regressions = []
+    for run in current['runs']:
+        old = old_runs.get((run['board'], run['strategy']))
+        if old is None:
+            continue
+        label = "{} {}".format(run['board'], run['strategy'])
+        for metric in METRICS:
+            if metric == 'time' and max(old['time'], run['time']) < min_time:
+                continue
+            if old[metric] and run[metric] > old[metric] * (1 + threshold / 100.0):
+                change = 100.0 * (run[metric] - old[metric]) / old[metric]
+                regressions.append("{}: {} {} -> {} (+{:.1f}%)".format(
+                    label, metric, old[metric], run[metric], change))
+        if old['path_cost'] is not None and (run['path_cost'] is None
+                                             or run['path_cost'] > old['path_cost']):
+            regressions.append("{}: path_cost {} -> {}".format(
+                label, old['path_cost'], run['path_cost']))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="benchmark and write a JSON baseline")
+    run_parser.add_argument('out')
+    run_parser.add_argument('--depths', default='8,14,20',
+                            help="comma-separated optimal move depths")
+    run_parser.add_argument('--per-depth', type=int, default=2)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--strategies', default=",".join(DEFAULT_STRATEGIES))
+    run_parser.add_argument('--repeat', type=int, default=3)
+    cmp_parser = commands.add_parser('compare', help="check results against a baseline")
+    cmp_parser.add_argument('baseline')
+    cmp_parser.add_argument('current', nargs='?',
+                            help="results file to check (default: re-run the baseline's boards)")
+    cmp_parser.add_argument('--threshold', type=float, default=10.0,
+                            help="percent increase that counts as a regression")
+    cmp_parser.add_argument('--min-time', type=float, default=0.01,
+                            help="ignore time changes on runs faster than this many seconds")
+    cmp_parser.add_argument('--save', help="also write the re-run results to this file")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        depths = [int(d) for d in args.depths.split(',')]
+        boards = boards_at_depths(depths, args.per_depth, args.seed)
+        suite = run_suite(boards, args.strategies.split(','), args.repeat, log=sys.stdout)
+        with open(args.out, 'w') as f:
+            json.dump(suite, f, indent=1)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if args.current:
+            with open(args.current) as f:
+                current = json.load(f)
+        else:
+            boards = [tuple(b) for b in baseline['boards']]
+            current = run_suite(boards, baseline['strategies'], baseline['repeat'],
+                                log=sys.stdout)
+            if args.save:
+                with open(args.save, 'w') as f:
+                    json.dump(current, f, indent=1)
+        regressions = compare(baseline, current, args.threshold, args.min_time)
+        for line in regressions:
+            print("REGRESSION " + line)
+        print("{} regression(s) over {}%".format(len(regressions), args.threshold))
+        sys.exit(1 if regressions else 0)
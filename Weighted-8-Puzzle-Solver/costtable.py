@@ -0,0 +1,136 @@
+"""Precomputed optimal cost-to-goal table for the weighted 8-puzzle.
+
+The table is built once by a backward uniform-cost search from the goal, covering all 181,440
+reachable boards.  For every board it stores the optimal cost to reach the goal and the first move
+of an optimal path, indexed by EightPuzzleBoard.rank().  Tables are saved to disk and memory-mapped
+on first use, so solving a board is just a walk of the stored moves.
+
+"""
+import array
+import heapq
+import mmap
+import os
+import sys
+
+import puzz
+import tablefiles
+
+UNREACHED = 0xFFFF  # cost entry for boards the search never reached
+NO_MOVE = 255  # move entry for the goal itself (and unreached boards)
+
+_loaded = tablefiles.GoalCache()  # goal string -> CostTable, so each file is mapped once
+
+
+def table_path(goal):
+    """Return the file a table for the given goal board is stored in."""
+    return os.path.join(tablefiles.table_dir(), "cost_table_{}.bin".format(goal))
+
+
+def build_table(goal, step_cost):
+    """Run a backward uniform-cost search from goal over the whole state space.
+
+    Args:
+        goal: an EightPuzzleBoard object for the goal state
+        step_cost: function (prev_state, state) -> cost of the move from prev_state to state
+
+    Returns: a (costs, moves) pair, where costs is an array of optimal costs to the goal and
+        moves is a bytearray of indexes into puzz.MOVES giving the first move of an optimal path
+    """
+    costs = array.array('H', [UNREACHED]) * puzz.NUM_RANKS
+    moves = bytearray([NO_MOVE]) * puzz.NUM_RANKS
+    goal_rank = goal.rank()
+    costs[goal_rank] = 0
+    frontier = [(0, goal_rank, goal)]  # ranks are unique, so boards are never compared
+    done = bytearray(puzz.NUM_RANKS)
+
+    while frontier:
+        cost, rank, board = heapq.heappop(frontier)
+        if done[rank]:
+            continue
+        done[rank] = 1
+        for move, prev in board.successors().items():
+            # moves are reversible at the same cost, so prev reaches board with the opposite move
+            prev_rank = prev.rank()
+            prev_cost = cost + step_cost(prev, board)
+            if prev_cost < costs[prev_rank]:
+                costs[prev_rank] = prev_cost
+                moves[prev_rank] = puzz.MOVES.index(puzz.OPPOSITE_MOVE[move])
+                heapq.heappush(frontier, (prev_cost, prev_rank, prev))
+    return costs, moves
+
+
+def save_table(path, costs, moves):
+    """Write a table to disk: the cost array followed by the move bytes.
+
+    The table is written to a temporary file first and then renamed into place, so other processes
+    never see (or map) a partly written file.
+    """
+    temp_path = "{}.{}.tmp".format(path, os.getpid())  # one per writer, for concurrent builders
+    with open(temp_path, 'wb') as f:
+        costs.tofile(f)
+        f.write(moves)
+    os.replace(temp_path, path)
+
+
+class CostTable:
+    """Memory-mapped view of a table written by save_table()."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        split = puzz.NUM_RANKS * array.array('H').itemsize
+        self._costs = view[:split].cast('H')
+        self._moves = view[split:]
+
+    def cost(self, board):
+        """Return the optimal cost from board to the goal (UNREACHED if it cannot get there)."""
+        return self._costs[board.rank()]
+
+    def next_move(self, board):
+        """Return the first move of an optimal path from board, or None at the goal."""
+        move = self._moves[board.rank()]
+        return None if move == NO_MOVE else puzz.MOVES[move]
+
+    def walk(self, board, goal):
+        """Follow the stored moves from board to goal.
+
+        Returns: a list of (move, EightPuzzleBoard) pairs starting with ('start', board), in the
+            same format as solver.findpath(), or None if board cannot reach the goal
+        """
+        path = [('start', board)]
+        cost = self.cost(board)
+        move = self.next_move(board)
+        while move is not None:
+            board = board.successors()[move]
+            path.append((move, board))
+            next_cost = self.cost(board)
+            if next_cost >= cost:  # only unsolvable boards (which share ranks) stop descending
+                return None
+            cost = next_cost
+            move = self.next_move(board)
+        if board != goal:
+            return None
+        return path
+
+
+def load_table(goal, step_cost):
+    """Return the CostTable for goal, building and saving it first if there is no file yet."""
+    key = str(goal)
+    cost_table = _loaded.get(key)
+    if cost_table is None:
+        path = table_path(key)
+        if not os.path.exists(path):
+            costs, moves = build_table(goal, step_cost)
+            save_table(path, costs, moves)
+        cost_table = CostTable(path)
+        _loaded.put(key, cost_table)
+    return cost_table
+
+
+if __name__ == '__main__':
+    import solver
+    goal = puzz.EightPuzzleBoard(sys.argv[1]) if len(sys.argv) > 1 else solver.GOAL_STATE
+    costs, moves = build_table(goal, solver.calculateCost)
+    save_table(table_path(str(goal)), costs, moves)
+    print("saved table for {}, max cost {}".format(goal, max(costs)))
@@ -0,0 +1,328 @@
+"""Disk-backed layer-by-layer enumeration of a puzzle's state space, for boards beyond 3x3.
+
+The enumeration runs backward from the goal, one cost layer at a time (or one move-count layer,
+with unit weights).  States are never kept in a set.  Instead, every generated state is appended
+to an in-memory buffer of at most chunk_size records, and a full buffer is sorted and written out
+as runs, one per cost bucket.  When a bucket's turn comes, its runs are merged into one sorted
+stream; duplicates within it are dropped, and so are states already in an earlier layer, found
+by merging against the earlier layers on disk (delayed duplicate detection).  A state that costs c
+to reach from a layer can only have been finished within 2 * c of that layer, so only the last
+2 * (largest step cost) worth of layers need checking.  Those are kept in one sorted window file,
+which the newest layers are merged into (and the oldest states dropped from) every MERGE_LAYERS
+layers.
+
+Memory use is the buffer plus one read block per open file, however large the state space.  The
+finished layers are merged into one table file sorted by packed state, with the cost to the goal
+and the first move toward it, which ExternalTable memory-maps and binary-searches.  solver.py's
+'table' strategy uses these files for boards larger than 3x3 (3x3 boards use costtable.py).
+
+Packed states are stored as 64-bit ints, so 3x3 and 4x4 boards are supported.
+
+Usage:
+    python extbfs.py 4 [--goal GOAL] [--max-cost 200] [--chunk-size 1000000] [--moves]
+
+"""
+import argparse
+import bisect
+import heapq
+import itertools
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+import patterndb
+import puzz
+import tablefiles
+
+NO_MOVE = 255  # move entry for the goal itself
+LAYER_RECORD = struct.Struct('<QBB')  # packed state, blank position, move toward the goal
+TABLE_RECORD = struct.Struct('<QIB')  # packed state, cost to the goal, move toward the goal
+BLOCK = 4096  # records read or written at a time
+MERGE_LAYERS = 16  # layers kept as separate files before they are merged into the window file
+MOVE_INDEX = {move: i for i, move in enumerate(puzz.MOVES)}
+OPPOSITE_INDEX = {move: MOVE_INDEX[puzz.OPPOSITE_MOVE[move]] for move in puzz.MOVES}
+
+_loaded = tablefiles.GoalCache()  # table path -> ExternalTable, so each file is mapped once
+
+
+def unit_weight(tile):
+    """Cost of moving a tile once when counting moves (breadth-first layers)."""
+    return 1
+
+
+def table_path(goal, weighted=True):
+    """Return the file a table for the given goal board is stored in."""
+    name = "ext_table_{}.bin" if weighted else "ext_moves_{}.bin"
+    return os.path.join(tablefiles.table_dir(), name.format(goal))
+
+
+def _read(path, record=LAYER_RECORD):
+    # stream the records of a file, a block at a time
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(record.size * BLOCK)
+            if not data:
+                return
+            yield from record.iter_unpack(data)
+
+
+def _write(path, records, record=LAYER_RECORD):
+    # write records to a file, a block at a time; returns how many were written
+    count = 0
+    with open(path, 'wb') as f:
+        while True:
+            block = [record.pack(*r) for r in itertools.islice(records, BLOCK)]
+            if not block:
+                return count
+            f.write(b"".join(block))
+            count += len(block)
+
+
+def _unique(records):
+    # the first record for each state, from records sorted by state
+    last = None
+    for record in records:
+        if record[0] != last:
+            last = record[0]
+            yield record
+
+
+def _with_cost(cost, layer_path):
+    # a layer file's records as TABLE_RECORD fields
+    for state, _, move in _read(layer_path):
+        yield state, cost, move
+
+
+def _state_blocks(path, record):
+    # the states in a file, as one sorted tuple per block read (unpacked in a single call; both
+    # record formats have three fields, the first being the state)
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(record.size * BLOCK)
+            if not data:
+                return
+            yield struct.unpack('<' + record.format[1:] * (len(data) // record.size), data)[::3]
+
+
+def _without(records, path, record=LAYER_RECORD):
+    # records (sorted by state) whose state is not in a file
+    blocks = _state_blocks(path, record)
+    block = next(blocks, None)
+    start = 0
+    for record in records:
+        state = record[0]
+        while block is not None and block[-1] < state:
+            block = next(blocks, None)
+            start = 0
+        if block is not None:
+            start = bisect.bisect_left(block, state, start)
+            if block[start] == state:
+                continue
+        yield record
+
+
+def enumerate_layers(goal, work_dir, weight=patterndb.squared_weight, max_cost=None,
+                     chunk_size=1000000):
+    """Enumerate the states that can reach goal, in layers of equal cost, on disk.
+
+    Args:
+        goal: the goal board (3x3 or 4x4)
+        work_dir: directory for the run and layer files
+        weight: function tile -> cost of moving that tile once (unit_weight for move counts)
+        max_cost: stop after the layer with this cost (None enumerates everything)
+        chunk_size: most generated records held in memory before they are written out
+
+    Returns: a list of (cost, layer file, state count) for the layers in cost order.  Layer files
+        hold LAYER_RECORDs sorted by packed state.
+    """
+    if goal.BITS * goal.SIZE > 64:
+        raise ValueError("only boards whose packed states fit in 64 bits are supported")
+    bits = goal.BITS
+    mask = (1 << bits) - 1
+    move_table = goal.MOVE_TABLE
+    weights = [weight(tile) for tile in range(goal.SIZE)]
+    window = 2 * max(weights[1:])  # earlier layers a new state could be a duplicate of
+    buffer = {0: [(goal.packed(), goal.blank_pos(), NO_MOVE)]}  # cost -> (state, blank, move)
+    buffered = 1
+    runs = {}  # cost -> run files not yet merged into a layer
+    run_names = itertools.count()
+    layers = []
+    recent = []  # layers that are not in the window file yet
+    window_path = os.path.join(work_dir, "window.bin")  # TABLE_RECORDs of recent states
+    _write(window_path, iter([]), TABLE_RECORD)
+
+    while buffer or runs:
+        cost = min(itertools.chain(runs, buffer))
+        if max_cost is not None and cost > max_cost:
+            break
+        in_memory = sorted(buffer.pop(cost, []))
+        buffered -= len(in_memory)
+        paths = runs.pop(cost, [])
+        candidates = _unique(heapq.merge(in_memory, *(_read(path) for path in paths)))
+        candidates = _without(candidates, window_path, TABLE_RECORD)
+        for _, earlier_path in recent:
+            candidates = _without(candidates, earlier_path)
+        layer_path = os.path.join(work_dir, "layer_{}.bin".format(cost))
+        count = _write(layer_path, candidates)
+        for path in paths:
+            os.remove(path)
+        layers.append((cost, layer_path, count))
+        recent.append((cost, layer_path))
+        if len(recent) >= MERGE_LAYERS:  # fold them into the window, dropping states too old
+            kept = (r for r in _read(window_path, TABLE_RECORD) if r[1] >= cost - window)
+            merged = heapq.merge(kept, *(_with_cost(c, path) for c, path in recent))
+            temp_path = "{}.{}.tmp".format(window_path, os.getpid())
+            _write(temp_path, merged, TABLE_RECORD)
+            os.replace(temp_path, window_path)
+            recent = []
+
+        for state, blank, move in _read(layer_path):
+            for succ_move, pos in move_table[blank]:
+                if MOVE_INDEX[succ_move] == move:  # straight back toward the goal
+                    continue
+                shift = pos * bits
+                tile = (state >> shift) & mask
+                succ = state + (tile << (blank * bits)) - (tile << shift)
+                succ_cost = cost + weights[tile]
+                if succ_cost not in buffer:
+                    buffer[succ_cost] = []
+                buffer[succ_cost].append((succ, pos, OPPOSITE_INDEX[succ_move]))
+                buffered += 1
+                if buffered >= chunk_size:  # write every bucket out as a sorted run
+                    for run_cost, records in buffer.items():
+                        path = os.path.join(work_dir, "run_{}.bin".format(next(run_names)))
+                        records.sort()
+                        _write(path, iter(records))
+                        runs.setdefault(run_cost, []).append(path)
+                    buffer.clear()
+                    buffered = 0
+    return layers
+
+
+def build_table(goal, path=None, weight=patterndb.squared_weight, max_cost=None,
+                chunk_size=1000000, work_dir=None):
+    """Enumerate the states that can reach goal and save them as a table file.
+
+    Args:
+        goal: the goal board (3x3 or 4x4)
+        path: the table file (default: table_path(goal), or the moves variant for unit_weight)
+        weight, max_cost, chunk_size: as for enumerate_layers()
+        work_dir: where the temporary run and layer files go (default: the system temp dir)
+
+    Returns: (path, number of states in the table)
+    """
+    if path is None:
+        path = table_path(goal, weight is not unit_weight)
+    temp_dir = tempfile.mkdtemp(prefix="extbfs_", dir=work_dir)
+    try:
+        layers = enumerate_layers(goal, temp_dir, weight, max_cost, chunk_size)
+        merged = heapq.merge(*(_with_cost(cost, layer_path) for cost, layer_path, _ in layers))
+        temp_path = "{}.{}.tmp".format(path, os.getpid())  # one per writer, for concurrent builders
+        count = _write(temp_path, merged, TABLE_RECORD)
+        os.replace(temp_path, path)
+    finally:
+        shutil.rmtree(temp_dir)
+    _loaded.pop(path)
+    return path, count
+
+
+class ExternalTable:
+    """Memory-mapped view of a table written by build_table(), searched by packed state."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = len(self._map) // TABLE_RECORD.size
+
+    def _find(self, board):
+        # binary search for a board's (state, cost, move) record; None if it isn't in the table
+        state = board.packed()
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            record = TABLE_RECORD.unpack_from(self._map, middle * TABLE_RECORD.size)
+            if record[0] < state:
+                low = middle + 1
+            elif record[0] > state:
+                high = middle
+            else:
+                return record
+        return None
+
+    def cost(self, board):
+        """Return the optimal cost from board to the goal, or None if board isn't in the table."""
+        record = self._find(board)
+        return None if record is None else record[1]
+
+    def next_move(self, board):
+        """Return the first move of an optimal path from board (None at the goal or if unknown)."""
+        record = self._find(board)
+        if record is None or record[2] == NO_MOVE:
+            return None
+        return puzz.MOVES[record[2]]
+
+    def walk(self, board, goal):
+        """Follow the stored moves from board to goal.
+
+        Returns: a list of (move, board) pairs starting with ('start', board), in the same
+            format as solver.findpath(), or None if board isn't in the table
+        """
+        path = [('start', board)]
+        record = self._find(board)
+        if record is None:
+            return None
+        while record[2] != NO_MOVE:
+            move = puzz.MOVES[record[2]]
+            board = board.successors()[move]
+            path.append((move, board))
+            record = self._find(board)
+        if board != goal:
+            return None
+        return path
+
+    def __len__(self):
+        return self._count
+
+
+def load_table(goal, weighted=True):
+    """Return the ExternalTable for goal.  Raises ValueError if it hasn't been built yet."""
+    path = table_path(goal, weighted)
+    external_table = _loaded.get(path)
+    if external_table is None:
+        if goal.WIDTH not in (3, 4):
+            raise ValueError("no table for goal {}; only 3x3 and 4x4 tables are "
+                             "supported".format(goal))
+        if not os.path.exists(path):
+            raise ValueError("no table for goal {}; build one with: python extbfs.py {} "
+                             "--goal {}".format(goal, goal.WIDTH, goal))
+        external_table = ExternalTable(path)
+        _loaded.put(path, external_table)
+    return external_table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('width', type=int, choices=[3, 4])
+    parser.add_argument('--goal', help="goal board string (default: the standard goal)")
+    parser.add_argument('--max-cost', type=int,
+                        help="stop after this cost (or move count); 4x4 spaces are far too big "
+                             "to enumerate completely")
+    parser.add_argument('--chunk-size', type=int, default=1000000,
+                        help="generated states held in memory before they are written out")
+    parser.add_argument('--moves', action='store_true',
+                        help="count moves instead of weighted costs (writes ext_moves_*.bin)")
+    parser.add_argument('--work-dir', help="directory for temporary files")
+    parser.add_argument('--table-dir',
+                        help="directory the table is saved in (default: $PUZZLE_TABLE_DIR, or "
+                             "the directory of this code)")
+    args = parser.parse_args()
+    if args.table_dir:
+        tablefiles.set_table_dir(args.table_dir)
+
+    goal = puzz.make_board(args.goal) if args.goal else puzz.goal_board(args.width)
+    path, count = build_table(goal, weight=unit_weight if args.moves else patterndb.squared_weight,
+                              max_cost=args.max_cost, chunk_size=args.chunk_size,
+                              work_dir=args.work_dir)
+    print("saved {} states to {}".format(count, path))
@@ -0,0 +1,199 @@
+"""Disjoint additive pattern databases for weighted sliding-tile puzzles.
+
+A pattern database covers a subset of the tiles.  For every placement of those tiles it stores the
+cheapest cost of moving them (and only them) to their goal positions, where moving a tile costs its
+weight and moving any other tile is free.  Since every real move is paid for by at most one
+pattern, the lookups of disjoint patterns can be added together and remain admissible.
+
+Databases are built by a backward uniform-cost search from the goal and stored as flat arrays of
+16-bit costs, indexed by the pattern tiles' positions written as a base-(board size) number.  The
+builder only needs the board dimensions and goal layout, so it also works for boards beyond 3x3.
+
+"""
+import array
+import heapq
+import os
+
+import tablefiles
+
+UNREACHED = 0xFFFF
+
+DEFAULT_PATTERNS = ((1, 2, 3, 4), (5, 6, 7, 8))  # for 3x3 boards
+
+_loaded = tablefiles.GoalCache()  # (goal string, patterns) -> AdditivePatternDB
+
+
+def default_patterns(size):
+    """Return the tile groups used for a board with size positions.
+
+    3x3 boards use DEFAULT_PATTERNS.  Larger boards use runs of three consecutive tiles, which
+    keeps each database's backward search small enough to build quickly in pure Python.
+    """
+    if size == 9:
+        return DEFAULT_PATTERNS
+    tiles = list(range(1, size))
+    return tuple(tuple(tiles[i:i + 3]) for i in range(0, len(tiles), 3))
+
+
+def squared_weight(tile):
+    """Cost of moving a tile once, matching the squared tile costs used by the solver."""
+    return tile ** 2
+
+
+def _neighbors(width, height):  # positions adjacent to each position, in reading order
+    adjacent = []
+    for pos in range(width * height):
+        row, col = divmod(pos, width)
+        near = []
+        if row > 0:
+            near.append(pos - width)
+        if row < height - 1:
+            near.append(pos + width)
+        if col > 0:
+            near.append(pos - 1)
+        if col < width - 1:
+            near.append(pos + 1)
+        adjacent.append(tuple(near))
+    return adjacent
+
+
+def build_pattern_db(pattern, goal_tiles, width, height, weight=squared_weight):
+    """Build a pattern database by backward uniform-cost search from the goal.
+
+    Args:
+        pattern: sequence of the (non-blank) tiles covered by this database
+        goal_tiles: sequence of tile numbers in the goal layout, in reading order (0 is the blank)
+        width, height: board dimensions
+        weight: function tile -> cost of moving that tile once
+
+    Returns: an array('H') with one entry per index (see PatternDB.index), holding the minimum
+        cost over all blank positions, or UNREACHED for placements that cannot occur
+    """
+    size = width * height
+    adjacent = _neighbors(width, height)
+    weights = [weight(tile) for tile in pattern]
+    goal_positions = tuple(list(goal_tiles).index(tile) for tile in pattern)
+    goal_blank = list(goal_tiles).index(0)
+    num_entries = size ** len(pattern)
+
+    dist = {}  # (positions, blank) -> cost
+    start = (goal_positions, goal_blank)
+    dist[start] = 0
+    frontier = [(0, goal_positions, goal_blank)]
+    db = array.array('H', [UNREACHED]) * num_entries
+
+    while frontier:
+        cost, positions, blank = heapq.heappop(frontier)
+        if dist[(positions, blank)] < cost:
+            continue  # stale entry
+        index = 0
+        for pos in reversed(positions):
+            index = index * size + pos
+        if cost < db[index]:
+            db[index] = cost
+        for pos in adjacent[blank]:
+            if pos in positions:  # a pattern tile slides into the blank
+                which = positions.index(pos)
+                next_positions = positions[:which] + (blank,) + positions[which + 1:]
+                next_cost = cost + weights[which]
+            else:  # some other tile moves, which this pattern does not pay for
+                next_positions = positions
+                next_cost = cost
+            key = (next_positions, pos)
+            if next_cost < dist.get(key, UNREACHED):
+                dist[key] = next_cost
+                heapq.heappush(frontier, (next_cost, next_positions, pos))
+    return db
+
+
+class PatternDB:
+    """Lookup wrapper around a single pattern's cost array."""
+
+    def __init__(self, pattern, costs, size):
+        self.pattern = tuple(pattern)
+        self._costs = costs
+        self._places = tuple(size ** i for i in range(len(pattern)))
+
+    @property
+    def costs(self):
+        """The cost array, indexed by index()."""
+        return self._costs
+
+    @property
+    def places(self):
+        """The place value of each pattern tile's position in index()."""
+        return self._places
+
+    def index(self, where):
+        """Return the array index for a board, given where[tile] = position of tile."""
+        index = 0
+        for tile, place in zip(self.pattern, self._places):
+            index += where[tile] * place
+        return index
+
+    def lookup(self, where):
+        """Return the stored cost for a board, given where[tile] = position of tile."""
+        return self._costs[self.index(where)]
+
+
+class AdditivePatternDB:
+    """A set of disjoint pattern databases whose lookups are summed."""
+
+    def __init__(self, dbs):
+        self.dbs = list(dbs)
+
+    def heuristic(self, where):
+        """Return the summed pattern costs for a board, given where[tile] = position of tile."""
+        total = 0
+        for db in self.dbs:
+            total += db.lookup(where)
+        return total
+
+
+def db_path(goal, pattern):
+    """Return the file a pattern database for the given goal string and tiles is stored in."""
+    name = "pdb_{}_{}.bin".format(goal, "-".join(str(t) for t in pattern))
+    return os.path.join(tablefiles.table_dir(), name)
+
+
+def load_pattern_db(pattern, goal_tiles, width, height, path, weight=squared_weight):
+    """Load a pattern database from path, building and saving it first if needed.
+
+    A file of the wrong length (e.g. left over from an interrupted run) is rebuilt.  New files are
+    written under a temporary name and renamed into place, so other processes never read a partly
+    written database.
+    """
+    size = width * height
+    entries = size ** len(pattern)
+    costs = array.array('H')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) == entries * costs.itemsize:
+            costs.frombytes(data)
+    if len(costs) != entries:
+        costs = build_pattern_db(pattern, goal_tiles, width, height, weight)
+        temp_path = "{}.{}.tmp".format(path, os.getpid())  # one per writer
+        with open(temp_path, 'wb') as f:
+            costs.tofile(f)
+        os.replace(temp_path, path)
+    return PatternDB(pattern, costs, size)
+
+
+def load_additive(goal, width=3, height=3, patterns=DEFAULT_PATTERNS):
+    """Return the (cached) additive pattern database for a goal board.
+
+    Args:
+        goal: the goal board; str(goal) must list its tiles in reading order, one character per
+            tile, in base 36 (so boards up to 6x6 can be described)
+        width, height: board dimensions
+        patterns: disjoint groups of tiles, one database per group
+    """
+    key = (str(goal), tuple(tuple(p) for p in patterns))
+    pattern_db = _loaded.get(key)
+    if pattern_db is None:
+        goal_tiles = [int(c, 36) for c in key[0]]
+        dbs = [load_pattern_db(p, goal_tiles, width, height, db_path(key[0], p)) for p in key[1]]
+        pattern_db = AdditivePatternDB(dbs)
+        _loaded.put(key, pattern_db)
+    return pattern_db
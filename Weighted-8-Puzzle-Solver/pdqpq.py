@@ -1,3 +1,4 @@
+import collections
 import heapq
 import itertools
 
@@ -66,3 +67,209 @@ class PriorityQueue:
             if str(t) != self.REMOVED:
                 rets.append("{}: {}".format(p, t))
         return ", ".join(rets)
+
+
+class BucketPriorityQueue:
+    """Priority queue for small non-negative integer priorities (a bucket queue, as in Dial's
+    algorithm).
+
+    Tasks live in an array of FIFO buckets, one per priority level, and pop() scans upward from a
+    moving pointer to the lowest bucket that may hold a live task.  Adds, updates and removals are
+    O(1); a re-prioritized task leaves its old bucket entry behind, which is dropped when pop()
+    reaches it.  Ties pop in insertion order, just like PriorityQueue.
+    """
+
+    def __init__(self):
+        self.buckets = []  # buckets[p] is a deque of (count, task) entries with priority p
+        self.entry_finder = {}  # maps task to its live (priority, count) pair
+        self.counter = itertools.count()  # unique sequence count
+        self.min_priority = 0  # no live task has a priority lower than this
+
+    def add(self, task, priority=0):
+        """Add a new task or update the priority of an existing task.
+
+        Args:
+            task: any hashable python object or primitive type
+            priority: non-negative integer priority (lower priorities are popped first!)
+        """
+        if priority < 0 or priority != int(priority):
+            raise ValueError("bucket queue priorities must be non-negative integers")
+        priority = int(priority)
+        count = next(self.counter)
+        self.entry_finder[task] = (priority, count)
+        while len(self.buckets) <= priority:
+            self.buckets.append(collections.deque())
+        self.buckets[priority].append((count, task))
+        if priority < self.min_priority:
+            self.min_priority = priority
+
+    def remove(self, task):
+        """Remove an existing task.  Raise KeyError if not found."""
+        del self.entry_finder[task]
+
+    def get(self, task):
+        """Get the priority of a given task."""
+        return self.entry_finder[task][0]
+
+    def pop(self):
+        """Remove and return the lowest priority task. Raise KeyError if empty."""
+        while self.entry_finder:
+            bucket = self.buckets[self.min_priority]
+            while bucket:
+                count, task = bucket.popleft()
+                entry = self.entry_finder.get(task)
+                if entry is not None and entry[1] == count:  # skip entries that were replaced
+                    del self.entry_finder[task]
+                    return task
+            self.min_priority += 1
+        raise KeyError('pop from an empty priority queue')
+
+    def empty(self):
+        """Return true if the queue is empty."""
+        return len(self.entry_finder) == 0
+
+    def __contains__(self, key):
+        return key in self.entry_finder
+
+    def __len__(self):
+        return len(self.entry_finder)
+
+    def __str__(self):
+        rets = []
+        for priority, count, task in sorted((p, c, t) for t, (p, c) in self.entry_finder.items()):
+            rets.append("{}: {}".format(priority, task))
+        return ", ".join(rets)
+
+
+class _HeapEntry:
+    """A task's slot in IndexedPriorityQueue.
+
+    key is the (priority, count) pair the heap is ordered by, and index is the entry's current
+    position in the heap list.
+    """
+
+    __slots__ = ('key', 'task', 'index')
+
+    def __init__(self, key, task, index):
+        self.key = key
+        self.task = task
+        self.index = index
+
+
+class IndexedPriorityQueue:
+    """Position-indexed d-ary heap with in-place priority updates.
+
+    Every task has exactly one entry, which records its own position in the heap, so changing a
+    priority moves that entry up or down in place and remove() takes it out for real.  Nothing is
+    ever left behind, so the heap is always exactly as large as the live queue.  Ties pop in
+    insertion order (a re-prioritized task counts as newly inserted), just like PriorityQueue.
+    """
+
+    def __init__(self, arity=4):
+        self.pq = []  # list of _HeapEntry objects arranged in a d-ary heap
+        self.entry_finder = {}  # maps task to entry
+        self.counter = itertools.count()  # unique sequence count
+        self.arity = arity
+
+    def add(self, task, priority=0):
+        """Add a new task or update the priority of an existing task.
+
+        Args:
+            task: any hashable python object or primitive type
+            priority: priority level associated with the task (lower priorities are popped first!)
+        """
+        count = next(self.counter)
+        entry = self.entry_finder.get(task)
+        if entry is None:
+            entry = _HeapEntry((priority, count), task, len(self.pq))
+            self.entry_finder[task] = entry
+            self.pq.append(entry)
+            self._sift_up(entry.index)
+        else:
+            lower = priority < entry.key[0]
+            entry.key = (priority, count)
+            if lower:  # decrease-key
+                self._sift_up(entry.index)
+            else:  # same or higher priority (the newer count also sorts it later among ties)
+                self._sift_down(entry.index)
+
+    def remove(self, task):
+        """Remove an existing task.  Raise KeyError if not found."""
+        entry = self.entry_finder.pop(task)
+        last = self.pq.pop()
+        if last is not entry:  # fill the hole with the last entry and restore the heap order
+            last.index = entry.index
+            self.pq[entry.index] = last
+            self._sift_up(last.index)
+            self._sift_down(last.index)
+
+    def get(self, task):
+        """Get the priority of a given task."""
+        return self.entry_finder[task].key[0]
+
+    def pop(self):
+        """Remove and return the lowest priority task. Raise KeyError if empty."""
+        if not self.pq:
+            raise KeyError('pop from an empty priority queue')
+        top = self.pq[0]
+        del self.entry_finder[top.task]
+        last = self.pq.pop()
+        if last is not top:
+            last.index = 0
+            self.pq[0] = last
+            self._sift_down(0)
+        return top.task
+
+    def _sift_up(self, index):
+        pq = self.pq
+        entry = pq[index]
+        key = entry.key
+        arity = self.arity
+        while index > 0:
+            parent_index = (index - 1) // arity
+            parent = pq[parent_index]
+            if key >= parent.key:
+                break
+            pq[index] = parent
+            parent.index = index
+            index = parent_index
+        pq[index] = entry
+        entry.index = index
+
+    def _sift_down(self, index):
+        pq = self.pq
+        size = len(pq)
+        arity = self.arity
+        entry = pq[index]
+        key = entry.key
+        while True:
+            first = index * arity + 1
+            if first >= size:
+                break
+            best = first
+            best_key = pq[first].key
+            for child in range(first + 1, min(first + arity, size)):
+                child_key = pq[child].key
+                if child_key < best_key:
+                    best, best_key = child, child_key
+            if key <= best_key:
+                break
+            pq[index] = pq[best]
+            pq[index].index = index
+            index = best
+        pq[index] = entry
+        entry.index = index
+
+    def empty(self):
+        """Return true if the queue is empty."""
+        return len(self.entry_finder) == 0
+
+    def __contains__(self, key):
+        return key in self.entry_finder
+
+    def __len__(self):
+        return len(self.entry_finder)
+
+    def __str__(self):
+        entries = sorted(self.pq, key=lambda e: e.key)
+        return ", ".join("{}: {}".format(e.key[0], e.task) for e in entries)
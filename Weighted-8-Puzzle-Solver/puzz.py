@@ -1,131 +1,408 @@
 BLANK_CHAR = '0'
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'  # tile characters, so boards up to 6x6 fit
 
+# Board positions are numbered in reading order (top-left to bottom-right), which is the same
+# order as the characters of a board string.  A board is packed into a single int with a fixed
+# number of bits per position: the tile at position i lives in bits BITS*i through BITS*i+BITS-1.
+# 3x3 and 4x4 boards use four bits per tile (so a 15-puzzle fits in 64 bits); 5x5 and 6x6 use
+# five and six.
 
-class EightPuzzleBoard:
-    """Class representing a single state of an 8-puzzle board.
+MOVES = ('up', 'down', 'left', 'right')
+
+OPPOSITE_MOVE = {'up': 'down', 'down': 'up', 'left': 'right', 'right': 'left'}
+
+
+def _build_move_table(width):
+    """For each blank position, list the (move, position) pairs of the tiles that can slide in."""
+    table = []
+    for blank in range(width * width):
+        row, col = divmod(blank, width)
+        moves = []
+        if row < width - 1:
+            moves.append(('up', blank + width))  # tile below the blank moves up
+        if row > 0:
+            moves.append(('down', blank - width))  # tile above the blank moves down
+        if col < width - 1:
+            moves.append(('left', blank + 1))  # tile right of the blank moves left
+        if col > 0:
+            moves.append(('right', blank - 1))  # tile left of the blank moves right
+        table.append(tuple(moves))
+    return tuple(table)
+
+
+MOVE_TABLE = _build_move_table(3)
+
+# 3x3 boards are ranked by blank position and by the order of the eight tiles read around the
+# blank.  Only even orderings of the tiles are reachable from the goal, so the last two tiles are
+# implied and every reachable board gets a distinct rank in range(NUM_RANKS).
+NUM_RANKS = 181440
+BLANK_RANKS = 20160  # ranks per blank position: rank // BLANK_RANKS is the blank position
+_RANK_WEIGHTS = (2520, 360, 60, 12, 3, 1)  # (7-i)!/2 for the first six tiles
+
+
+def _build_rank_tables():
+    """Lookup tables for EightPuzzleBoard.rank().
+
+    With the blank squeezed out, the eight tiles are a 32-bit int.  The low 16 bits (the first
+    four tiles) index head_rank, their part of the rank, and head_seen, the set of those tiles
+    as a bitmask shifted left by 8.  That mask plus the next 8 bits (tiles five and six) index
+    tail_rank.  Only entries for distinct tiles 1-8 are filled in.
+    """
+    head_rank = [0] * (1 << 16)
+    head_seen = [0] * (1 << 16)
+    tail_rank = [0] * (1 << 16)
+    tiles = range(1, 9)
+    for a in tiles:
+        for b in tiles:
+            for c in tiles:
+                for d in tiles:
+                    head = (a, b, c, d)
+                    if len(set(head)) < 4:
+                        continue
+                    index = a | (b << 4) | (c << 8) | (d << 12)
+                    rank = 0
+                    for i, tile in enumerate(head):  # smaller tiles that come later
+                        rank += (tile - 1 - sum(t < tile for t in head[:i])) * _RANK_WEIGHTS[i]
+                    seen = 0
+                    for tile in head:
+                        seen |= 1 << (tile - 1)
+                    head_rank[index] = rank
+                    head_seen[index] = seen << 8
+                    for e in tiles:
+                        for f in tiles:
+                            if e == f or e in head or f in head:
+                                continue
+                            rank = ((e - 1 - sum(t < e for t in head)) * _RANK_WEIGHTS[4]
+                                    + (f - 1 - sum(t < f for t in head + (e,))) * _RANK_WEIGHTS[5])
+                            tail_rank[(seen << 8) | e | (f << 4)] = rank
+    return head_rank, head_seen, tail_rank
+
+
+_HEAD_RANK, _HEAD_SEEN, _TAIL_RANK = _build_rank_tables()
+# rank % BLANK_RANKS -> the eight tiles packed with the blank squeezed out, for each parity;
+# filled in by unrank() as ranks are asked for
+_UNRANKED = ([None] * BLANK_RANKS, [None] * BLANK_RANKS)
+
+
+def unrank(rank, parity=0):
+    """Return the EightPuzzleBoard with a given rank (the inverse of EightPuzzleBoard.rank()).
+
+    A rank stands for one board of each parity (see SlidingPuzzleBoard.parity()), so the parity
+    picks which; boards reachable from the standard goal have parity 0.
+    """
+    blank, index = divmod(rank, BLANK_RANKS)
+    tiles = _UNRANKED[parity][index]
+    if tiles is None:
+        remaining = list(range(1, 9))
+        order = []
+        rest = index
+        inversions = 0
+        for weight in _RANK_WEIGHTS:  # each digit counts the smaller tiles that come later
+            digit, rest = divmod(rest, weight)
+            inversions += digit
+            order.append(remaining.pop(digit))
+        if (inversions + (remaining[0] > remaining[1])) & 1 != parity:  # the last two fix it
+            remaining.reverse()
+        order += remaining
+        tiles = 0
+        for i, tile in enumerate(order):
+            tiles |= tile << (i << 2)
+        _UNRANKED[parity][index] = tiles
+    shift = blank << 2
+    state = (tiles & ((1 << shift) - 1)) | ((tiles >> shift) << (shift + 4))
+    return EightPuzzleBoard.from_packed(state, blank)
+
+
+class SlidingPuzzleBoard:
+    """Class representing a single state of a square sliding-tile puzzle board.
 
     In general, the board positions are set when an object is created and should not be
     manipulated.  The successor functions generate reachable states from the current board.
 
-    The tiles themselves are represented by a list of digits internally, and manipulated
-    using (x, y) coordinates.
+    The tiles themselves are packed into a single int (BITS bits per tile), and manipulated
+    using (x, y) coordinates.  Successors are generated from a precomputed table of the moves
+    available for each blank position, and hashing/comparison work directly on the packed int.
+
+    Each board size is its own subclass (see BOARD_CLASSES), which sets the geometry attributes
+    below; board strings use one character from DIGITS per tile.
     """
 
+    __slots__ = ('_state', '_blank')
+
+    WIDTH = None  # tiles per side
+    SIZE = None  # number of positions
+    BITS = None  # bits per packed tile
+    MOVE_TABLE = None  # per-blank-position moves, from _build_move_table()
+
     def __init__(self, board_string, mods=None):
-        """Constructor for 8-puzzle board.
+        """Constructor for a puzzle board.
 
         Args:
-            board_string: nine-digit string describing the board, with '0' representing the blank
+            board_string: string with one character per tile (see DIGITS), with '0' representing
+                the blank
             mods: optional list of (x, y, value) tuples that are applied to the board_string
                 immediately after creation,
         """
-        self._board = list(board_string)
+        tiles = list(board_string)
+        if len(tiles) != self.SIZE:
+            raise ValueError("expected {} tiles, got {!r}".format(self.SIZE, board_string))
         if mods:
             for x, y, val in mods:
-                self._set_tile(x, y, val)
+                tiles[(self.WIDTH - 1 - y) * self.WIDTH + x] = val
+        state = 0
+        for pos, tile in enumerate(tiles):
+            state |= int(tile, 36) << (pos * self.BITS)
+        self._state = state
+        self._blank = tiles.index(BLANK_CHAR)
 
-    def _get_tile(self, x, y):  # return an individual tile value
-        return self._board[6 - y * 3 + x]
+    @classmethod
+    def from_packed(cls, state, blank):
+        """Build a board directly from its packed int and blank position, skipping parsing."""
+        board = cls.__new__(cls)
+        board._state = state
+        board._blank = blank
+        return board
 
-    def _set_tile(self, x, y, val):  # set an individual tile value
-        self._board[6 - y * 3 + x] = val
+    def packed(self):
+        """Return the packed int encoding of this board."""
+        return self._state
+
+    def _get_tile(self, x, y):  # return an individual tile value
+        return DIGITS[self.tile_at((self.WIDTH - 1 - y) * self.WIDTH + x)]
 
     def _create_successor(self, delta_x, delta_y):  # create a successor object (or None if invalid)
-        pos = self._board.index(BLANK_CHAR)
-        blank_x = pos % 3
-        blank_y = 2 - int(pos / 3)
+        width = self.WIDTH
+        blank = self._blank
+        blank_x = blank % width
+        blank_y = width - 1 - blank // width
         move_x = blank_x + delta_x
         move_y = blank_y + delta_y
-        if (move_x < 0) or (move_x > 2) or (move_y < 0) or (move_y > 2):
+        if (move_x < 0) or (move_x >= width) or (move_y < 0) or (move_y >= width):
             return None
-        else:
-            mods = [(blank_x, blank_y, self._get_tile(move_x, move_y)),
-                    (move_x, move_y, self._get_tile(blank_x, blank_y))]
-            succ = EightPuzzleBoard("".join(self._board), mods)
-            return succ
+        pos = (width - 1 - move_y) * width + move_x
+        tile = self.tile_at(pos)
+        bits = self.BITS
+        return self.from_packed(self._state + (tile << (blank * bits)) - (tile << (pos * bits)),
+                                pos)
 
     def success_up(self):
         """Generate the board resulting from moving a tile up into the blank space.
 
-        Returns: an EightPuzzleBoard object representing the successor state of this one, or None
-            if up is not a valid move for this board
+        Returns: a board object representing the successor state of this one, or None if up is
+            not a valid move for this board
         """
         return self._create_successor(0, -1)
 
     def success_down(self):
         """Generate the board resulting from moving a tile down into the blank space.
 
-        Returns: an EightPuzzleBoard object representing the successor state of this one, or None
-            if down is not a valid move for this board
+        Returns: a board object representing the successor state of this one, or None if down is
+            not a valid move for this board
         """
         return self._create_successor(0, 1)
 
     def success_right(self):
         """Generate the board resulting from moving a tile right into the blank space.
 
-        Returns: an EightPuzzleBoard object representing the successor state of this one, or None
-            if right is not a valid move for this board
+        Returns: a board object representing the successor state of this one, or None if right
+            is not a valid move for this board
         """
         return self._create_successor(-1, 0)
 
     def success_left(self):
         """Generate the board resulting from moving a tile left into the blank space.
 
-        Returns: an EightPuzzleBoard object representing the successor state of this one, or None
-            if left is not a valid move for this board
+        Returns: a board object representing the successor state of this one, or None if left is
+            not a valid move for this board
         """
         return self._create_successor(1, 0)
 
     def successors(self):
         """Generates all successors of this board.
 
-        Returns: a dictionary mapping moves to EightPuzzleBoard objects representing the results of
-            each valid move move for this board
+        Returns: a dictionary mapping moves to board objects representing the results of each
+            valid move move for this board
         """
-        u = self.success_up()
-        d = self.success_down()
-        l = self.success_left()
-        r = self.success_right()
+        state = self._state
+        bits = self.BITS
+        mask = (1 << bits) - 1
+        blank_shift = self._blank * bits
+        make = self.from_packed
         succs = {}
-        if u:
-            succs["up"] = u
-        if d: 
-            succs["down"] = d
-        if l: 
-            succs["left"] = l
-        if r:
-            succs["right"] = r
+        for move, pos in self.MOVE_TABLE[self._blank]:
+            shift = pos * bits
+            tile = (state >> shift) & mask
+            succs[move] = make(state + (tile << blank_shift) - (tile << shift), pos)
         return succs
 
+    def slide(self, pos):
+        """Move the tile at a position (in reading order) into the blank, in place.
+
+        This changes the board's hash, so it is only meant for searches that keep a private
+        working board (such as IDA*) and undo their moves by sliding the tile back.
+
+        Returns: the tile (as an int) that moved
+        """
+        bits = self.BITS
+        state = self._state
+        tile = (state >> (pos * bits)) & ((1 << bits) - 1)
+        self._state = state + (tile << (self._blank * bits)) - (tile << (pos * bits))
+        self._blank = pos
+        return tile
+
     def find(self, c):
         """Return the coordinates of a given tile.
-        
+
         Returns: a tuple containing x, y coordinates of c
         """
-        pos = self._board.index(c)
-        x = pos % 3
-        y = 2 - int(pos/3)
-        return x, y
+        width = self.WIDTH
+        if self.BITS == 4:  # hex digits of the packed int, last tile first
+            pos = self.SIZE - 1 - ("%0*x" % (self.SIZE, self._state)).index(c)
+        else:
+            pos = self.positions()[int(c, 36)]
+        return pos % width, width - 1 - pos // width
+
+    def parity(self):
+        """Return the board's move-invariant parity (0 or 1).
+
+        This is the parity of the number of inversions among the tiles (ignoring the blank),
+        plus the blank's row on boards with an even width.  No move changes it, so two boards of
+        the same size can only reach each other if their parities match (and then always can).
+        """
+        tiles = [tile for tile in self.tiles() if tile]
+        inversions = 0
+        for i, tile in enumerate(tiles):
+            for later in tiles[i + 1:]:
+                if later < tile:
+                    inversions += 1
+        if self.WIDTH % 2 == 0:
+            inversions += self._blank // self.WIDTH
+        return inversions & 1
+
+    def blank_pos(self):
+        """Return the position (in reading order) of the blank."""
+        return self._blank
+
+    def tile_at(self, pos):
+        """Return the tile (as an int) at a position (in reading order)."""
+        return (self._state >> (pos * self.BITS)) & ((1 << self.BITS) - 1)
+
+    def tiles(self):
+        """Return a list of the tiles (as ints) in reading order."""
+        state = self._state
+        bits = self.BITS
+        mask = (1 << bits) - 1
+        return [(state >> (pos * bits)) & mask for pos in range(self.SIZE)]
+
+    def positions(self):
+        """Return a list giving the position (in reading order) of each tile."""
+        where = [0] * self.SIZE
+        for pos, tile in enumerate(self.tiles()):
+            where[tile] = pos
+        return where
 
     def __str__(self):
-        return "".join(self._board)
+        if self.BITS == 4:
+            return ("%0*x" % (self.SIZE, self._state))[::-1]
+        return "".join([DIGITS[tile] for tile in self.tiles()])
 
     def __repr__(self):
-        return "".join(self._board)
+        return str(self)
 
     def __hash__(self):
-        return hash("".join(self._board))
+        return hash(self._state)
 
     def __eq__(self, other):
-        return "".join(self._board) == "".join(other._board)
-        
+        return self._state == other._state
+
     def pretty(self):
         """Pretty-print the board.
 
-        Returns: a readable three-line representation of the board
+        Returns: a readable representation of the board, one line per row
+        """
+        brd_str = str(self).replace(BLANK_CHAR, ".", 1)
+        width = self.WIDTH
+        return "\n".join(" ".join(brd_str[row:row + width])
+                         for row in range(0, self.SIZE, width))
+
+
+class EightPuzzleBoard(SlidingPuzzleBoard):
+    """Class representing a single state of an 8-puzzle board."""
+
+    __slots__ = ()
+
+    WIDTH = 3
+    SIZE = 9
+    BITS = 4
+    MOVE_TABLE = MOVE_TABLE
+
+    def rank(self):
+        """Return the permutation rank of this board.
+
+        Every board reachable from the goal state maps to a distinct int in range(NUM_RANKS).
+        Unreachable boards share a rank with a reachable one, so check solvability separately.
         """
-        brd_str = " ".join(self._board).replace(BLANK_CHAR, ".", 1)
-        return "{}\n{}\n{}".format(brd_str[:6], brd_str[6:12], brd_str[12:])
+        shift = self._blank << 2
+        state = self._state
+        # drop the blank's four bits, leaving the eight tiles in order
+        tiles = (state & ((1 << shift) - 1)) | ((state >> (shift + 4)) << shift)
+        head = tiles & 0xFFFF
+        return (self._blank * BLANK_RANKS + _HEAD_RANK[head]
+                + _TAIL_RANK[_HEAD_SEEN[head] | ((tiles >> 16) & 0xFF)])
+
+
+class FifteenPuzzleBoard(SlidingPuzzleBoard):
+    """Class representing a single state of a 15-puzzle (4x4) board."""
+
+    __slots__ = ()
+
+    WIDTH = 4
+    SIZE = 16
+    BITS = 4
+    MOVE_TABLE = _build_move_table(4)
+
+
+class TwentyFourPuzzleBoard(SlidingPuzzleBoard):
+    """Class representing a single state of a 24-puzzle (5x5) board."""
+
+    __slots__ = ()
+
+    WIDTH = 5
+    SIZE = 25
+    BITS = 5
+    MOVE_TABLE = _build_move_table(5)
+
+
+class ThirtyFivePuzzleBoard(SlidingPuzzleBoard):
+    """Class representing a single state of a 35-puzzle (6x6) board."""
+
+    __slots__ = ()
+
+    WIDTH = 6
+    SIZE = 36
+    BITS = 6
+    MOVE_TABLE = _build_move_table(6)
+
+
+BOARD_CLASSES = {3: EightPuzzleBoard, 4: FifteenPuzzleBoard, 5: TwentyFourPuzzleBoard,
+                 6: ThirtyFivePuzzleBoard}
+
+
+def board_class(width):
+    """Return the board class for width x width puzzles (3 through 6)."""
+    if width not in BOARD_CLASSES:
+        raise ValueError("unsupported board width: {}".format(width))
+    return BOARD_CLASSES[width]
+
+
+def make_board(board_string):
+    """Create a board of the right size for a board string (9, 16, 25 or 36 characters)."""
+    width = int(round(len(board_string) ** 0.5))
+    if width * width != len(board_string):
+        raise ValueError("board string is not square: {!r}".format(board_string))
+    return board_class(width)(board_string)
 
 
-    
+def goal_board(width):
+    """Return the standard goal board (blank first, then tiles in order) for a board width."""
+    return board_class(width)(DIGITS[:width * width])
@@ -0,0 +1,102 @@
+"""A bounded cache of optimal solutions, shared between searches toward the same goal.
+
+Every state on an optimal path has the rest of that path as an optimal solution of its own.  The
+cache remembers, for each state on the optimal paths it is given, the cost to go from that state
+to the goal and the first move to make.  A* uses the cached cost as an exact heuristic and stops
+as soon as it pops a cached state, finishing the path by following the cached moves.
+
+Entries are evicted least recently used first once the cache is full.  Paths are added from the
+start end, and a state that is used has its whole suffix refreshed in the same order, so the
+state after any cached state is always newer than it.  Eviction therefore only ever removes the
+start of a chain, and every cached state can still be followed to the goal.
+
+"""
+import collections
+import json
+
+import puzz
+
+
+class SolutionCache:
+    """Cost-to-go and next move for states on optimal paths to one goal.
+
+    Args:
+        goal: the goal board every cached path ends at
+        max_entries: the most states kept before the least recently used are evicted
+    """
+
+    def __init__(self, goal, max_entries=100000):
+        self.goal = goal
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()  # packed state -> (cost to go, next move)
+        self.hits = 0
+        self.misses = 0
+
+    def cost_to_go(self, state):
+        """Return the cached optimal cost from a state to the goal, or None if it isn't cached."""
+        entry = self._entries.get(state.packed())
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def suffix(self, state):
+        """Return the cached path from a state to the goal as (move, board) pairs.
+
+        The state itself is not included.  Following the path marks its states as recently used.
+        """
+        path = []
+        entries = self._entries
+        packed = state.packed()
+        while state != self.goal:
+            entries.move_to_end(packed)
+            move = entries[packed][1]
+            state = state.successors()[move]
+            packed = state.packed()
+            path.append((move, state))
+        if packed in entries:
+            entries.move_to_end(packed)
+        return path
+
+    def add_path(self, path, step_cost):
+        """Cache every state on an optimal path.
+
+        Args:
+            path: list of (move, board) pairs from a start board to the goal, as returned by
+                solver.solve_puzzle() (the first move is 'start')
+            step_cost: function (board, next board) -> cost of that move
+        """
+        if not path or path[-1][1] != self.goal:
+            raise ValueError("path does not end at the cache's goal")
+        to_go = [0] * len(path)
+        for i in range(len(path) - 2, -1, -1):
+            to_go[i] = to_go[i + 1] + step_cost(path[i][1], path[i + 1][1])
+        entries = self._entries
+        for i, (_, state) in enumerate(path):
+            packed = state.packed()
+            next_move = path[i + 1][0] if i + 1 < len(path) else None
+            entries[packed] = (to_go[i], next_move)
+            entries.move_to_end(packed)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def save(self, filename):
+        """Write the cache to a JSON file, oldest entries first."""
+        entries = [[packed, cost, move] for packed, (cost, move) in self._entries.items()]
+        with open(filename, 'w') as f:
+            json.dump({'goal': str(self.goal), 'max_entries': self.max_entries,
+                       'entries': entries}, f)
+
+    @classmethod
+    def load(cls, filename):
+        """Read a cache written by save()."""
+        with open(filename) as f:
+            data = json.load(f)
+        cache = cls(puzz.make_board(data['goal']), data['max_entries'])
+        for packed, cost, move in data['entries']:
+            cache._entries[packed] = (cost, move)
+        return cache
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,9 +1,44 @@
 import sys
+import argparse
+import json
+import functools
+import heapq
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
 import puzz
 import pdqpq
+import costtable
+import extbfs
+import patterndb
+import statetable
+import solcache
+import tablefiles
+import telemetry as search_telemetry
 import time
 MAX_SEARCH_ITERS = 100000
 GOAL_STATE = puzz.EightPuzzleBoard("012345678")
+HEURISTICS = ('h1', 'h2', 'h3', 'h4', 'pdb')
+# h1 and h2 count moves, far too little against squared move costs for a search with no duplicate
+# detection: idastar-h2 on 802356174 runs for tens of millions of expansions without finishing
+IDASTAR_HEURISTICS = ('h3', 'h4', 'pdb')
+# h4 needs each board's rows and columns, which vsearch.BatchHeuristic has no vectorized form of
+VASTAR_HEURISTICS = ('h1', 'h2', 'h3', 'pdb')
+# first heuristic weight tried by the anytime searches; h1 and h2 count moves rather than
+# squared costs, so they need a much larger weight to steer the search
+ANYTIME_WEIGHTS = {'h1': 20.0, 'h2': 10.0, 'h3': 3.0, 'h4': 3.0, 'pdb': 3.0}
+ANYTIME_STEP = 0.5  # how much the weight drops after each solution
+WEIGHT_SCALE = 10  # anytime priorities are scaled by this so that they stay integers
+# strategies whose paths are always optimal, and so can be added to a solution cache.  The pattern
+# databases are admissible but not consistent, so astar reopens closed states that it finds a
+# cheaper path to.
+OPTIMAL_STRATEGIES = ('ucost', 'bi-ucost', 'astar-h3', 'astar-h4', 'astar-pdb', 'idastar-h3',
+                      'idastar-h4', 'idastar-pdb', 'hdastar-h3', 'hdastar-h4', 'hdastar-pdb',
+                      'vastar-h3', 'vastar-pdb', 'table')
+QUEUES = {'heap': pdqpq.PriorityQueue, 'bucket': pdqpq.BucketPriorityQueue,
+          'indexed': pdqpq.IndexedPriorityQueue}
 
 
 # ----- HELPER FUNCTIONS -----
@@ -24,237 +59,1139 @@ def findpath(parent, start, end):
    return path
 
 
+def replayMoves(start, moves):
+   # build a findpath-style path by applying a list of move directions to the start board
+   path = [('start', start)]
+   for direction in moves:
+       start = start.successors()[direction]
+       path.append((direction, start))
+   return path
+
+
+def defaultGoal(state):
+   # the standard goal board for the size of the given board
+   if isinstance(state, puzz.EightPuzzleBoard):
+       return GOAL_STATE
+   return puzz.goal_board(state.WIDTH)
+
+
+def sameParity(state, goal):
+   # boards can only reach each other when their move-invariant parities match
+   return type(state) is type(goal) and state.parity() == goal.parity()
+
+
+def is_solvable(board, goal=None):
+   """Return True if a board can reach the goal (by default the standard goal of its size).
+
+   The check is a parity test, so it is cheap enough to pre-filter whole batches before solving.
+
+   Args:
+       board: a puzz board object or a board string (any supported size)
+       goal: optional goal board or board string; defaults to the standard goal for the board's size
+   """
+   if isinstance(board, str):
+       board = puzz.make_board(board)
+   if isinstance(goal, str):
+       goal = puzz.make_board(goal)
+   if goal is None:
+       goal = defaultGoal(board)
+   return sameParity(board, goal)
+
+
 def calculateCost(prev_state, state):
-   x, y = prev_state.find('0')
-   square = int(state._get_tile(x, y))
+   square = state.tile_at(prev_state.blank_pos())  # the tile that slid into the old blank
    return square ** 2
 
 
 def calculateHeuristic(heuristic, state1, state2):
-   if heuristic == 'h1':
-       heuristic_value = calculateMisplacedTiles(state1, state2)
-   elif heuristic == 'h2':
-       heuristic_value = calculateManhattanDistance(state1, state2)
-   else:
-       heuristic_value = calculateWeightedManhattanDistance(state1, state2)
+   if heuristic == 'pdb':
+       return calculatePatternDatabase(state1, state2)
+   if heuristic == 'h4':
+       return calculateLinearConflict(state1, state2)
+   return tableHeuristic(heuristicTable(heuristic, state2), state1)
+
+
+GOAL_CACHE_SIZE = tablefiles.GOAL_CACHE_SIZE  # goals whose lookup tables are kept (LRU)
+CONFLICT_CACHE_SIZE = 1 << 16  # linear-conflict penalties remembered per goal (LRU)
+
+
+@functools.lru_cache(maxsize=GOAL_CACHE_SIZE)
+def goalTables(goal_string):
+   """Lookup tables for one goal layout, built on first use and kept in a bounded LRU cache.
+
+   Returns: a dictionary with 'coords', the (x, y) goal position of each tile (y counts rows from
+       the top), 'h1', 'h2' and 'h3', the per-tile heuristic tables described in
+       heuristicTable(), 'lines', the positions in each row (top to bottom) and then each column
+       (left to right), and 'conflicts', lineConflict()'s memo of linear-conflict penalties for
+       h4, a function (line, tiles) -> penalty with an LRU cache of CONFLICT_CACHE_SIZE entries
+   """
+   goal = puzz.make_board(goal_string)
+   width = goal.WIDTH
+   coords = tuple((pos % width, pos // width) for pos in goal.positions())
+   rows = [tuple(range(y * width, (y + 1) * width)) for y in range(width)]
+   columns = [tuple(range(x, goal.SIZE, width)) for x in range(width)]
+   tables = {'coords': coords, 'lines': tuple(rows + columns)}
+   tables['conflicts'] = functools.lru_cache(maxsize=CONFLICT_CACHE_SIZE)(
+       functools.partial(linePenalty, coords))
+   for heuristic in ('h1', 'h2', 'h3'):
+       table = []
+       for tile, (x2, y2) in enumerate(coords):
+           row = []
+           for pos in range(goal.SIZE):
+               x1, y1 = pos % width, pos // width
+               if heuristic == 'h1':
+                   row.append(0 if (x1, y1) == (x2, y2) else 1)
+               elif heuristic == 'h2':
+                   row.append(abs(x1-x2) + abs(y1-y2))
+               else:
+                   row.append(tile ** 2 * (abs(x1-x2) + abs(y1-y2)))
+           table.append(tuple(row))
+       tables[heuristic] = tuple(table)
+   return tables
+
+
+def heuristicTable(heuristic, goal):
+   """Per-tile heuristic contributions toward goal: table[tile][pos] for every tile and position.
+
+   The h1, h2 and h3 heuristics are sums over tiles, so a board's value is the sum of the entries
+   for its tile positions.  Returns None for heuristics that are not per-tile sums (h4, pdb).
+   """
+   if heuristic in ('h4', 'pdb'):
+       return None
+   return goalTables(str(goal))[heuristic]
+
+
+def tableHeuristic(table, state):
+   # full evaluation of a per-tile heuristic table
+   heuristic_value = 0
+   for tile, pos in enumerate(state.positions()):
+       heuristic_value += table[tile][pos]
    return heuristic_value
 
 
+def updateHeuristic(table, heuristic_value, prev_state, state):
+   # a move only changes where one tile and the blank are, so adjust for just those two
+   to_pos = prev_state.blank_pos()
+   from_pos = state.blank_pos()
+   return slideHeuristic(table, heuristic_value, state.tile_at(to_pos), from_pos, to_pos)
+
+
+def slideHeuristic(table, heuristic_value, tile, from_pos, to_pos):
+   # tile slid from from_pos to to_pos, and the blank went the other way
+   return (heuristic_value + table[tile][to_pos] - table[tile][from_pos]
+           + table[0][from_pos] - table[0][to_pos])
+
+
+def successorHeuristic(heuristic, table, heuristic_value, prev_state, state, goal):
+   # incremental update when the heuristic has a per-tile table (or is h4), full evaluation
+   # otherwise
+   if heuristic == 'h4':
+       return updateLinearConflict(heuristic_value, prev_state, state, goal)
+   if table is None:
+       return calculateHeuristic(heuristic, state, goal)
+   return updateHeuristic(table, heuristic_value, prev_state, state)
+
+
+def lowerBoundHeuristic(table, heuristic_value, state):
+   # h1 and h2 also count the blank, which can make them overestimate by up to a factor of two;
+   # without the blank's term they never overestimate the squared move costs
+   if table is None:
+       return heuristic_value
+   return heuristic_value - table[0][state.blank_pos()]
+
+
 def calculateMisplacedTiles(state1, state2):
-   #print('entering misplacedTiles')
-   misplaced_heuristic = 0
-   for tile in range(9):
-       if state1.find(str(tile)) != state2.find(str(tile)):
-           misplaced_heuristic += 1
-   return misplaced_heuristic
+   return tableHeuristic(heuristicTable('h1', state2), state1)
 
 
 def calculateManhattanDistance(state1, state2):
-   #print('entering manhattandistance')
-   manhattan_distance = 0
-   for tile in range(9):
-       x1, y1 = state1.find(str(tile))
-       x2, y2 = state2.find(str(tile))
-       manhattan_distance += abs(x1-x2) + abs(y1-y2)
-   return manhattan_distance
+   return tableHeuristic(heuristicTable('h2', state2), state1)
 
 
 def calculateWeightedManhattanDistance(state1, state2):
-   #print('entering weightedmanhattandistance')
-   manhattan_distance = 0
-   for tile in range(9):
-       x1, y1 = state1.find(str(tile))
-       x2, y2 = state2.find(str(tile))
-       manhattan_distance += tile ** 2 * (abs(x1-x2) + abs(y1-y2))
-   return manhattan_distance
+   return tableHeuristic(heuristicTable('h3', state2), state1)
+
+
+@functools.lru_cache(maxsize=GOAL_CACHE_SIZE)
+def conflictTables(goal):
+   # goalTables() keyed by the goal board itself, which is cheaper than formatting it every move
+   return goalTables(str(goal))
+
+
+def linePenalty(coords, line, tiles):
+   # weighted linear-conflict penalty for one row or column (see goalTables()['lines']) holding
+   # tiles, given the goal coordinates of each tile.  Tiles that are in their goal line can only
+   # pass each other by stepping out of the line and back, two extra moves at tile**2 each, so
+   # every tile outside the heaviest subset that is already in goal order costs at least
+   # 2 * tile**2 on top of its Manhattan distance.  Extra moves for rows are vertical and for
+   # columns horizontal, so the two kinds of penalty add up.
+   width = len(tiles)
+   if line < width:  # a row: order tiles by goal x
+       members = [(coords[t][0], t * t) for t in tiles if t and coords[t][1] == line]
+   else:  # a column: order tiles by goal y
+       members = [(coords[t][1], t * t) for t in tiles if t and coords[t][0] == line - width]
+   best = []  # best[i]: heaviest in-order subset ending with members[i]
+   for i, (order, weight) in enumerate(members):
+       best.append(weight + max([best[j] for j in range(i) if members[j][0] < order], default=0))
+   return 2 * (sum(weight for _, weight in members) - max(best, default=0))
+
+
+def lineConflict(tables, line, tiles):
+   # linePenalty() for the goal of tables, remembered in its bounded cache
+   return tables['conflicts'](line, tiles)
+
+
+def calculateLinearConflict(state1, state2):
+   # h4: weighted Manhattan distance (h3) plus the linear-conflict penalty of every row and column
+   tables = conflictTables(state2)
+   heuristic_value = tableHeuristic(tables['h3'], state1)
+   for line, positions in enumerate(tables['lines']):
+       heuristic_value += lineConflict(tables, line, tuple(map(state1.tile_at, positions)))
+   return heuristic_value
+
+
+def updateLinearConflict(heuristic_value, prev_state, state, goal):
+   to_pos = prev_state.blank_pos()
+   return slideLinearConflict(heuristic_value, state, state.tile_at(to_pos), state.blank_pos(),
+                              to_pos, goal)
+
+
+def slideLinearConflict(heuristic_value, board, tile, from_pos, to_pos, goal):
+   # h4 after tile slid from from_pos to to_pos, given the board after the move.  A move changes
+   # one tile's column (sideways) or row (up/down), so besides the h3 update only the penalties
+   # of those two columns or rows change; the order of tiles along the line it moved in doesn't
+   tables = conflictTables(goal)
+   heuristic_value = slideHeuristic(tables['h3'], heuristic_value, tile, from_pos, to_pos)
+   width = board.WIDTH
+   if from_pos // width == to_pos // width:
+       changed = (width + from_pos % width, width + to_pos % width)
+   else:
+       changed = (from_pos // width, to_pos // width)
+   for line in changed:
+       positions = tables['lines'][line]
+       after = tuple(map(board.tile_at, positions))
+       before = tuple(tile if pos == from_pos else 0 if pos == to_pos else t
+                      for pos, t in zip(positions, after))
+       heuristic_value += lineConflict(tables, line, after) - lineConflict(tables, line, before)
+   return heuristic_value
+
+
+def calculatePatternDatabase(state1, state2):
+   # additive pattern databases (tiles 1-4 and 5-8 on 3x3), built toward state2 on first use
+   pattern_db = patterndb.load_additive(state2, state2.WIDTH, state2.WIDTH,
+                                        patterndb.default_patterns(state2.SIZE))
+   return pattern_db.heuristic(state1.positions())
 
 
 # ----- SEARCH ALGORITHMS -----
 
 
-def bfs(start_state, results):
-   frontier = pdqpq.PriorityQueue()
-   frontier.add(start_state)
+def bfs(start_state, results, goal=GOAL_STATE, frontier_class=pdqpq.PriorityQueue, telemetry=None):
+   states = statetable.for_board(start_state)  # closed set, parents and costs
+   key = states.key
+   start_key = key(start_state)
+   goal_key = key(goal)
+   frontier = frontier_class()
+   frontier.add(start_key)
    results['frontier_count'] += 1
-   explored = set()
-   parent = {start_state: [None, None, 0]}  # state: [parent, direction (n), cost]
+   states.record(start_key, start_state, None, None, 0)
 
    while not frontier.empty():
-       node = frontier.pop()
-       explored.add(node)  # add node to explored set
+       node_key = frontier.pop()
+       node = states.board(node_key)
+       states.close(node_key)  # add node to explored set
        successors = node.successors()  # successors of node that was just popped
        results['expanded_count'] += 1
+       if telemetry is not None:
+           telemetry.on_expand(len(frontier), len(states))
+       prev_cost = states.cost(node_key)  # total cost up to the previous state
 
        for n in successors:  # for each direction in successors
-           prev_cost = int(parent[node][2])  # total cost up to the previous state
-           cur_cost = calculateCost(node, successors[n])  # cost to get to this state from previous
-           cost = cur_cost + prev_cost  # total cost from start to current state
-           if (successors[n] not in frontier) and (successors[n] not in explored):
-               if successors[n] == GOAL_STATE:
-                   parent[successors[n]] = [node, n, cost]  # current_state : previous_state, direction of current
-                   results['path'] = findpath(parent, start_state, GOAL_STATE)
-                   results['path_cost'] = parent[GOAL_STATE][2]
+           succ = successors[n]
+           succ_key = key(succ)
+           cost = prev_cost + calculateCost(node, succ)  # total cost from start to current state
+           if (succ_key not in frontier) and not states.is_closed(succ_key):
+               states.record(succ_key, succ, node_key, n, cost)
+               if succ_key == goal_key:
+                   results['path'] = states.path(start_key, goal_key)
+                   results['path_cost'] = cost
                    return results
-               else:
-                   frontier.add(successors[n])
-                   results['frontier_count'] += 1
-                   parent[successors[n]] = [node, n, cost]
+               frontier.add(succ_key)
+               results['frontier_count'] += 1
    del results['path']
    return results
 
 
-def ucost(start_state, results):
-
-   frontier = pdqpq.PriorityQueue()  # create the frontier
-   frontier.add(start_state, 0)  # add start state to frontier
+def ucost(start_state, results, goal=GOAL_STATE, frontier_class=pdqpq.PriorityQueue,
+          telemetry=None):
+   states = statetable.for_board(start_state)  # closed set, parents and costs
+   key = states.key
+   start_key = key(start_state)
+   goal_key = key(goal)
+   frontier = frontier_class()  # create the frontier
+   frontier.add(start_key, 0)  # add start state to frontier
    results['frontier_count'] += 1
-
-   explored = set()  # dictionary of explored states
-
-   state_info = {start_state: [None, None, 0]}  # state: [parent, direction (n), cost]
-   cost = 0
+   states.record(start_key, start_state, None, None, 0)
 
    while not frontier.empty():
-       node = frontier.pop()
-
-       explored.add(node)  # add node to explored set
-       if str(node) == str(GOAL_STATE):  # if node and goal states are the same
-           #print('solution found')
-           results['path_cost'] = state_info[GOAL_STATE][2]  # add path cost to results
-           #print(state_info)
-           results['path'] = findpath(state_info, start_state, GOAL_STATE)
+       node_key = frontier.pop()
+       states.close(node_key)  # add node to explored set
+       if node_key == goal_key:  # if node and goal states are the same
+           results['path_cost'] = states.cost(goal_key)  # add path cost to results
+           results['path'] = states.path(start_key, goal_key)
            return results
 
-       explored.add(node)
+       node = states.board(node_key)
        successors = node.successors()
        results['expanded_count'] += 1
+       if telemetry is not None:
+           telemetry.on_expand(len(frontier), len(states))
+       prev_cost = states.cost(node_key)  # total cost up to the previous state
 
        for n in successors:
-           prev_cost = int(state_info[node][2])  # total cost up to the previous state
-           cur_cost = calculateCost(node, successors[n])  # cost to get to this state from previous
-           cost = cur_cost + prev_cost  # total cost from start to current state
+           succ = successors[n]
+           succ_key = key(succ)
+           cost = prev_cost + calculateCost(node, succ)  # total cost from start to current state
 
-           if (successors[n] not in frontier) and (successors[n] not in explored):
-               frontier.add(successors[n], cost)
-               state_info[successors[n]] = [node, n, cost]  # update dictionary
+           if (succ_key not in frontier) and not states.is_closed(succ_key):
+               frontier.add(succ_key, cost)
+               states.record(succ_key, succ, node_key, n, cost)
                results['frontier_count'] += 1
 
-           elif (successors[n] in frontier) and (frontier.get(successors[n]) > cost):
-               frontier.add(successors[n], cost)
-               state_info[successors[n]] = [node, n, cost]  # update dictionary
+           elif (succ_key in frontier) and (frontier.get(succ_key) > cost):
+               frontier.add(succ_key, cost)
+               states.record(succ_key, succ, node_key, n, cost)
+               if telemetry is not None:
+                   telemetry.on_reprioritize()
 
    del results['path']
    del results['path_cost']
    return results
 
 
-def greedy(start_state, heuristic, results):
-   frontier = pdqpq.PriorityQueue()  # create the frontier
-   frontier.add(start_state, 0)  # add start state to frontier
-   results['frontier_count'] += 1
+def biucost(start_state, results, goal=GOAL_STATE, frontier_class=pdqpq.PriorityQueue,
+            telemetry=None):
+   # uniform-cost searches from both ends; index 0 searches forward, index 1 back from the goal
+   states = [statetable.for_board(start_state), statetable.for_board(start_state)]
+   key = states[0].key  # both tables key boards the same way
+   start_key = key(start_state)
+   goal_key = key(goal)
+   frontiers = [frontier_class(), frontier_class()]
+   states[0].record(start_key, start_state, None, None, 0)
+   states[1].record(goal_key, goal, None, None, 0)
+   frontiers[0].add(start_key, 0)
+   frontiers[1].add(goal_key, 0)
+   results['frontier_count'] += 2
+
+   best_cost = None  # cheapest start-to-goal path seen so far (mu)
+   meet = start_key if start_key == goal_key else None
+   if meet is not None:
+       best_cost = 0
+   last_cost = [0, 0]  # cost of the last state popped on each side (never decreases)
+
+   while not frontiers[0].empty() and not frontiers[1].empty():
+       side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1  # grow the smaller search
+       other = 1 - side
+       node_key = frontiers[side].pop()
+       last_cost[side] = states[side].cost(node_key)
+       # every unexplored path costs at least the sum of the two sides' frontier minimums
+       if best_cost is not None and last_cost[0] + last_cost[1] >= best_cost:
+           break
+
+       states[side].close(node_key)
+       node = states[side].board(node_key)
+       successors = node.successors()
+       results['expanded_count'] += 1
+       if telemetry is not None:
+           telemetry.on_expand(len(frontiers[0]) + len(frontiers[1]),
+                               len(states[0]) + len(states[1]))
 
-   explored = set()  # dictionary of explored states
+       for n in successors:
+           succ = successors[n]
+           succ_key = key(succ)
+           cost = last_cost[side] + calculateCost(node, succ)  # moves cost the same both ways
+           if states[side].is_closed(succ_key):
+               continue
+           if succ_key not in frontiers[side]:
+               frontiers[side].add(succ_key, cost)
+               states[side].record(succ_key, succ, node_key, n, cost)
+               results['frontier_count'] += 1
+           elif frontiers[side].get(succ_key) > cost:
+               frontiers[side].add(succ_key, cost)
+               states[side].record(succ_key, succ, node_key, n, cost)
+               if telemetry is not None:
+                   telemetry.on_reprioritize()
+           else:
+               continue
+           if succ_key in states[other]:  # the searches touch: check the joined path
+               total = cost + states[other].cost(succ_key)
+               if best_cost is None or total < best_cost:
+                   best_cost = total
+                   meet = succ_key
+
+   if meet is None:
+       del results['path']
+       del results['path_cost']
+       return results
+
+   path = states[0].path(start_key, meet)
+   state_key = meet
+   while state_key != goal_key:  # follow the backward search's parents the rest of the way
+       parent_key, direction = states[1].parent(state_key)
+       path.append((puzz.OPPOSITE_MOVE[direction], states[1].board(parent_key)))
+       state_key = parent_key
+   results['path'] = path
+   results['path_cost'] = best_cost
+   return results
+
+
+def greedy(start_state, heuristic, results, goal=GOAL_STATE,
+           frontier_class=pdqpq.PriorityQueue, telemetry=None):
+   states = statetable.for_board(start_state)  # closed set, parents, costs and h values
+   key = states.key
+   start_key = key(start_state)
+   goal_key = key(goal)
+   frontier = frontier_class()  # create the frontier
+   frontier.add(start_key, 0)  # add start state to frontier
+   results['frontier_count'] += 1
 
-   state_info = {start_state: [None, None, 0]}  # state: [parent, direction (n), cost]
-   cost = 0
+   table = heuristicTable(heuristic, goal)
+   successor_h = successorHeuristic
+   start_h = calculateHeuristic(heuristic, start_state, goal)
+   if telemetry is not None:
+       successor_h = telemetry.timed(successorHeuristic)
+   states.record(start_key, start_state, None, None, 0, start_h)
 
    while not frontier.empty():
-       node = frontier.pop()
+       node_key = frontier.pop()
 
-       if str(node) == str(GOAL_STATE):  # if node and goal states are the same
-           results['path_cost'] = state_info[GOAL_STATE][2]  # add path cost to results
-           #state_info[successors[n]] = [node, n, cost]  # update dictionary
-           results['path'] = findpath(state_info, start_state, GOAL_STATE)
+       if node_key == goal_key:  # if node and goal states are the same
+           results['path_cost'] = states.cost(goal_key)  # add path cost to results
+           results['path'] = states.path(start_key, goal_key)
            return results
 
-       explored.add(node)
+       states.close(node_key)
+       node = states.board(node_key)
        successors = node.successors()
        results['expanded_count'] += 1
+       if telemetry is not None:
+           telemetry.on_expand(len(frontier), len(states))
+       prev_cost = states.cost(node_key)  # total cost up to the previous state
+       prev_h = states.h(node_key)
 
        for n in successors:
-           prev_cost = int(state_info[node][2])  # total cost up to the previous state
-           cur_cost = calculateCost(node, successors[n])  # cost to get to this state from previous
-           cost = cur_cost + prev_cost  # total cost from start to current state
-           heuristic_value = calculateHeuristic(heuristic, successors[n], GOAL_STATE)
-           if (successors[n] not in frontier) and (successors[n] not in explored):
-               frontier.add(successors[n], heuristic_value)
-               state_info[successors[n]] = [node, n, cost]  # update dictionary
+           succ = successors[n]
+           succ_key = key(succ)
+           cost = prev_cost + calculateCost(node, succ)  # total cost from start to current state
+           heuristic_value = successor_h(heuristic, table, prev_h, node, succ, goal)
+           if (succ_key not in frontier) and not states.is_closed(succ_key):
+               frontier.add(succ_key, heuristic_value)
+               states.record(succ_key, succ, node_key, n, cost, heuristic_value)
                results['frontier_count'] += 1
 
-           elif (successors[n] in frontier) and (frontier.get(successors[n]) > heuristic_value):
-               frontier.add(successors[n], heuristic_value)
-               state_info[successors[n]] = [node, n, cost]  # update dictionary
+           elif (succ_key in frontier) and (frontier.get(succ_key) > heuristic_value):
+               frontier.add(succ_key, heuristic_value)
+               states.record(succ_key, succ, node_key, n, cost, heuristic_value)
+               if telemetry is not None:
+                   telemetry.on_reprioritize()
 
    del results['path']
    del results['path_cost']
    return results
 
 
-def astar(start_state, heuristic, results):
-   frontier = pdqpq.PriorityQueue()  # create the frontier
-   frontier.add(start_state, 0)  # add start state to frontier
+def astar(start_state, heuristic, results, goal=GOAL_STATE,
+          frontier_class=pdqpq.PriorityQueue, telemetry=None, cache=None):
+   states = statetable.for_board(start_state)  # closed set, parents, costs and h values
+   key = states.key
+   start_key = key(start_state)
+   goal_key = key(goal)
+   frontier = frontier_class()  # create the frontier
+   frontier.add(start_key, 0)  # add start state to frontier
    results['frontier_count'] += 1
 
-   explored = set()  # dictionary of explored states
-
-   state_info = {start_state: [None, None, 0]}  # state: [parent, direction (n), cost]
-   cost = 0
+   table = heuristicTable(heuristic, goal)
+   successor_h = successorHeuristic
+   start_h = calculateHeuristic(heuristic, start_state, goal)
+   if telemetry is not None:
+       successor_h = telemetry.timed(successorHeuristic)
+   states.record(start_key, start_state, None, None, 0, start_h)
+   cached = {}  # key: cost to go, for states whose optimal solution is in the cache
+   if cache is not None:
+       to_go = cache.cost_to_go(start_state)
+       if to_go is not None:
+           cached[start_key] = to_go
 
    while not frontier.empty():
-       node = frontier.pop()
-
+       node_key = frontier.pop()
 
-       if str(node) == str(GOAL_STATE):  # if node and goal states are the same
-           print('solution found')
-           results['path_cost'] = state_info[GOAL_STATE][2]  # add path cost to results
-           #state_info[successors[n]] = [node, n, cost]  # update dictionary
-           results['path'] = findpath(state_info, start_state, GOAL_STATE)
+       if node_key == goal_key:  # if node and goal states are the same
+           results['path_cost'] = states.cost(goal_key)  # add path cost to results
+           results['path'] = states.path(start_key, goal_key)
+           return results
+       if node_key in cached:  # the rest of the way is known to be optimal
+           results['path_cost'] = states.cost(node_key) + cached[node_key]
+           results['path'] = (states.path(start_key, node_key)
+                              + cache.suffix(states.board(node_key)))
            return results
 
-       explored.add(node)
+       states.close(node_key)
+       node = states.board(node_key)
        successors = node.successors()
        results['expanded_count'] += 1
+       if telemetry is not None:
+           telemetry.on_expand(len(frontier), len(states))
+       prev_cost = states.cost(node_key)  # total cost up to the previous state
+       prev_h = states.h(node_key)
 
        for n in successors:
-           prev_cost = int(state_info[node][2])  # total cost up to the previous state
-           cur_cost = calculateCost(node, successors[n])  # cost to get to this state from previous
-           cost = cur_cost + prev_cost  # total cost from start to current state
+           succ = successors[n]
+           succ_key = key(succ)
+           cost = prev_cost + calculateCost(node, succ)  # total cost from start to current state
 
-           heuristic_value = calculateHeuristic(heuristic, successors[n], GOAL_STATE)
+           heuristic_value = successor_h(heuristic, table, prev_h, node, succ, goal)
            priority = cost + heuristic_value
-           if (successors[n] not in frontier) and (successors[n] not in explored):
-               frontier.add(successors[n], priority)
-               state_info[successors[n]] = [node, n, cost]  # update dictionary
+           if cache is not None:  # a cached cost to go is exact, so it replaces h
+               to_go = cache.cost_to_go(succ)
+               if to_go is not None:
+                   cached[succ_key] = to_go
+                   priority = cost + to_go
+           if (succ_key not in frontier) and not states.is_closed(succ_key):
+               frontier.add(succ_key, priority)
+               states.record(succ_key, succ, node_key, n, cost, heuristic_value)
+               results['frontier_count'] += 1
+
+           elif (succ_key in frontier) and (frontier.get(succ_key) > priority):
+               frontier.add(succ_key, priority)
+               states.record(succ_key, succ, node_key, n, cost, heuristic_value)
+               if telemetry is not None:
+                   telemetry.on_reprioritize()
+
+           elif states.is_closed(succ_key) and cost < states.cost(succ_key):
+               # a cheaper path to an expanded state; only possible with an inconsistent
+               # heuristic (pdb), and the state has to be expanded again to stay optimal
+               states.reopen(succ_key)
+               frontier.add(succ_key, priority)
+               states.record(succ_key, succ, node_key, n, cost, heuristic_value)
+               if telemetry is not None:
+                   telemetry.on_reprioritize()
+
+   del results['path']
+   del results['path_cost']
+   return results
+
+
+def anytime(start_state, heuristic, results, goal=GOAL_STATE,
+            frontier_class=pdqpq.PriorityQueue, telemetry=None, weight=None,
+            step=ANYTIME_STEP, stop_time=None, max_expansions=None):
+   # ARA*: weighted A* that lowers the weight after each solution and carries the search over
+   states = statetable.for_board(start_state)  # closed set, parents, costs and h values
+   key = states.key
+   start_key = key(start_state)
+   goal_key = key(goal)
+   table = heuristicTable(heuristic, goal)
+   successor_h = successorHeuristic
+   if telemetry is not None:
+       successor_h = telemetry.timed(successorHeuristic)
+   start_h = calculateHeuristic(heuristic, start_state, goal)
+   states.record(start_key, start_state, None, None, 0, start_h)
+
+   if weight is None:
+       weight = ANYTIME_WEIGHTS[heuristic]
+   scaled_weight = int(round(weight * WEIGHT_SCALE))
+   scaled_step = max(1, int(round(step * WEIGHT_SCALE)))
+   frontier = frontier_class()  # priorities are WEIGHT_SCALE * g + scaled_weight * h
+   frontier.add(start_key, scaled_weight * start_h)
+   results['frontier_count'] += 1
+   incons = {}  # closed states whose cost dropped; they go back on the frontier next round
+   proven = None  # bound proven by the last round that finished
+   out_of_budget = False
+
+   while True:
+       # improve the path: expand until the goal's cost is no more than any frontier priority
+       while not frontier.empty():
+           if ((stop_time is not None and time.perf_counter() >= stop_time) or
+                   (max_expansions is not None and results['expanded_count'] >= max_expansions)):
+               out_of_budget = True
+               break
+           node_key = frontier.pop()
+           g = states.cost(node_key)
+           h = states.h(node_key)
+           priority = WEIGHT_SCALE * g + scaled_weight * h
+           if goal_key in states and WEIGHT_SCALE * states.cost(goal_key) <= priority:
+               frontier.add(node_key, priority)
+               break
+
+           states.close(node_key)
+           node = states.board(node_key)
+           successors = node.successors()
+           results['expanded_count'] += 1
+           if telemetry is not None:
+               telemetry.on_expand(len(frontier), len(states))
+
+           for n in successors:
+               succ = successors[n]
+               succ_key = key(succ)
+               cost = g + calculateCost(node, succ)
+               seen = succ_key in states
+               if seen and states.cost(succ_key) <= cost:
+                   continue
+               heuristic_value = successor_h(heuristic, table, h, node, succ, goal)
+               states.record(succ_key, succ, node_key, n, cost, heuristic_value)
+               if states.is_closed(succ_key):
+                   incons[succ_key] = None
+               else:
+                   if succ_key in frontier and telemetry is not None:
+                       telemetry.on_reprioritize()
+                   frontier.add(succ_key, WEIGHT_SCALE * cost + scaled_weight * heuristic_value)
+                   if not seen:
+                       results['frontier_count'] += 1
+       else:
+           if goal_key not in states:  # nothing left to expand and the goal was never reached
+               break
+
+       if goal_key not in states:  # ran out of budget before the first solution
+           break
+       if not out_of_budget:
+           proven = scaled_weight / WEIGHT_SCALE
+
+       # the cheapest unexpanded path costs at least min(g + h) over the frontier and incons
+       pending = list(incons)
+       while not frontier.empty():
+           pending.append(frontier.pop())
+       path = states.path(start_key, goal_key)
+       # parents along the path may have improved since the goal's cost was last set, so the
+       # path can be cheaper than that cost; add it up
+       goal_cost = 0
+       for (_, prev_state), (_, state) in zip(path, path[1:]):
+           goal_cost += calculateCost(prev_state, state)
+       lower = None
+       for pending_key in pending:
+           bound = states.cost(pending_key) + lowerBoundHeuristic(
+               table, states.h(pending_key), states.board(pending_key))
+           if lower is None or bound < lower:
+               lower = bound
+       if lower is None or goal_cost <= lower:
+           ratio = 1.0
+       else:
+           ratio = goal_cost / lower if lower > 0 else float('inf')
+       bound = ratio if proven is None else min(proven, ratio)
+       results['path'] = path
+       results['path_cost'] = goal_cost
+       results['suboptimality_bound'] = bound
+
+       if out_of_budget or bound <= 1.0 or scaled_weight <= WEIGHT_SCALE:
+           return results
+       # tighten the weight (to at most the bound just proven) and start another round from
+       # everything still open
+       scaled_weight = max(WEIGHT_SCALE, min(scaled_weight - scaled_step,
+                                             int(bound * WEIGHT_SCALE)))
+       incons = {}
+       states.reopen()
+       for pending_key in pending:
+           frontier.add(pending_key, (WEIGHT_SCALE * states.cost(pending_key)
+                                      + scaled_weight * states.h(pending_key)))
+
+   del results['path']
+   del results['path_cost']
+   return results
+
+
+def idastar(start_state, heuristic, results, goal=GOAL_STATE, telemetry=None):
+   # IDA* with the bound grown IDA*_CR-style: the f-values that went over the bound are counted,
+   # and the next bound is the smallest that lets in about as many new nodes as the last iteration
+   # expanded.  With h1/h2 (move counts against squared costs) raising the bound only to the
+   # smallest f that went over it meant hundreds of iterations that each added a few nodes.  When
+   # the bound skips past that smallest f, a goal found within it need not be the cheapest, so
+   # the rest of the iteration is searched branch-and-bound style (pruning f >= the best goal
+   # cost) and the cheapest goal path is returned at the end of it.
+   board = type(start_state)(str(start_state))  # private working board, moved in place
+   table = heuristicTable(heuristic, goal)
+   full_h, slide_h, slide_h4 = calculateHeuristic, slideHeuristic, slideLinearConflict
+   if telemetry is not None:
+       full_h, slide_h = telemetry.timed(calculateHeuristic), telemetry.timed(slideHeuristic)
+       slide_h4 = telemetry.timed(slideLinearConflict)
+   start_h = full_h(heuristic, board, goal)
+   results['frontier_count'] += 1
+   if board == goal:
+       results['path'] = [('start', start_state)]
+       return results
+
+   bound = start_h
+   exact = True  # whether bound is the smallest f that went over the last one
+   while True:
+       over = {}  # f-value: number of nodes pruned with it, for f over this iteration's bound
+       iteration_expanded = 0
+       best_cost = best_moves = None  # cheapest goal path found, when exact is False
+       moves = []  # directions taken from the start to reach the current board
+       # each frame: [remaining moves from this board, g, h, blank position before arriving]
+       stack = [[iter(board.MOVE_TABLE[board.blank_pos()]), 0, start_h, None]]
+       results['expanded_count'] += 1
+       if telemetry is not None:
+           telemetry.on_expand(len(stack), 0)
+
+       while stack:
+           frame = stack[-1]
+           g, h, came_from = frame[1], frame[2], frame[3]
+           for direction, pos in frame[0]:
+               if pos == came_from:  # don't undo the move that got us here
+                   continue
+               blank = board.blank_pos()
+               tile = board.slide(pos)
                results['frontier_count'] += 1
+               cost = g + tile ** 2
+               if heuristic == 'h4':
+                   succ_h = slide_h4(h, board, tile, pos, blank, goal)
+               elif table is None:
+                   succ_h = full_h(heuristic, board, goal)
+               else:
+                   succ_h = slide_h(table, h, tile, pos, blank)
+               f = cost + succ_h
+               if f > bound:
+                   over[f] = over.get(f, 0) + 1
+                   board.slide(blank)
+                   continue
+               moves.append(direction)
+               if board == goal:
+                   if exact:  # nothing open is cheaper, so this is optimal
+                       results['path'] = replayMoves(start_state, moves)
+                       results['path_cost'] = cost
+                       return results
+                   best_cost, best_moves = cost, list(moves)
+                   bound = cost - 1  # costs are integers; only cheaper goals are of interest
+                   board.slide(blank)
+                   moves.pop()
+                   continue
+               stack.append([iter(board.MOVE_TABLE[pos]), cost, succ_h, blank])
+               results['expanded_count'] += 1
+               iteration_expanded += 1
+               if telemetry is not None:
+                   telemetry.on_expand(len(stack), 0)
+               break
+           else:  # every move from this board has been tried, so back up
+               stack.pop()
+               if came_from is not None:
+                   board.slide(came_from)
+                   moves.pop()
+
+       if best_cost is not None:  # every path that could be cheaper was searched
+           results['path'] = replayMoves(start_state, best_moves)
+           results['path_cost'] = best_cost
+           return results
+       if not over:  # nothing was pruned, so the whole reachable space was searched
+           break
+       # the smallest bound that admits at least as many pruned nodes as this iteration expanded
+       admitted = 0
+       for f in sorted(over):
+           admitted += over[f]
+           if admitted > iteration_expanded:
+               break
+       exact = f == min(over)
+       bound = f
+
+   del results['path']
+   del results['path_cost']
+   return results
+
+
+BEAM_WIDTH = 100  # states kept per layer by 'beam-<heuristic>' when no ':W' is given
+
+
+def beamWidth(option):
+   # the W of a beam strategy's '<heuristic>:W' (BEAM_WIDTH if there is none), or None if W is
+   # not a whole number of at least 1
+   width = option.partition(':')[2]
+   if not width:
+       return BEAM_WIDTH
+   try:
+       width = int(width)
+   except ValueError:
+       return None
+   return width if width >= 1 else None
+
+
+def beam(start_state, heuristic, width, results, goal=GOAL_STATE, telemetry=None,
+         stop_time=None, max_expansions=None):
+   # beam search: breadth-first by depth, but each new layer is cut down to the width states with
+   # the lowest f = g + h (picked with heapq.nsmallest, a partial sort).  Only the kept states are
+   # remembered, so time and memory are O(width * depth).  The path is not always the cheapest,
+   # and the search fails if the beam drops every state that leads to the goal, or if it runs
+   # past stop_time or max_expansions (which cap the depth, and so the memory, when it wanders).
+   if width < 1:
+       raise ValueError("beam width must be at least 1, not {}".format(width))
+   table = heuristicTable(heuristic, goal)
+   successor_h = successorHeuristic
+   if telemetry is not None:
+       successor_h = telemetry.timed(successorHeuristic)
+   parent = {start_state: None}  # every state kept so far: (parent state, move), for findpath()
+   layer = [(0, calculateHeuristic(heuristic, start_state, goal), start_state)]  # (g, h, state)
+   results['frontier_count'] += 1
+   if start_state == goal:
+       results['path'] = [('start', start_state)]
+       return results
+
+   while layer:
+       if ((stop_time is not None and time.perf_counter() >= stop_time) or
+               (max_expansions is not None and results['expanded_count'] >= max_expansions)):
+           break
+       candidates = {}  # state: (g, h, parent state, move), cheapest way found this layer
+       for g, h, node in layer:
+           results['expanded_count'] += 1
+           if telemetry is not None:
+               telemetry.on_expand(len(layer), len(parent))
+           for move, succ in node.successors().items():
+               if succ in parent:  # already kept in an earlier layer
+                   continue
+               cost = g + calculateCost(node, succ)
+               if succ not in candidates or cost < candidates[succ][0]:
+                   candidates[succ] = (cost, successor_h(heuristic, table, h, node, succ, goal),
+                                       node, move)
+
+       if goal in candidates:
+           cost, _, node, move = candidates[goal]
+           parent[goal] = (node, move)
+           results['path'] = findpath(parent, start_state, goal)
+           results['path_cost'] = cost
+           return results
 
-           elif (successors[n] in frontier) and (frontier.get(successors[n]) > priority):
-               frontier.add(successors[n], priority)
-               state_info[successors[n]] = [node, n, cost]  # update dictionary
+       kept = heapq.nsmallest(width, candidates.items(), key=lambda item: item[1][0] + item[1][1])
+       layer = []
+       for succ, (cost, heuristic_value, node, move) in kept:
+           parent[succ] = (node, move)
+           layer.append((cost, heuristic_value, succ))
+       results['frontier_count'] += len(kept)
 
    del results['path']
    del results['path_cost']
    return results
 
 
-def solve_puzzle(start_state, strategy):
+HDA_ROUND_EXPANSIONS = 50  # expansions each hdastar worker makes per round, at most
+_OWNER_MIX = 0x9E3779B97F4A7C15  # Fibonacci hashing constant, spreads packed states evenly
+
+
+def stateOwner(packed, workers):
+   # the hdastar worker that owns a state, from the high bits of a multiplicative hash
+   return ((packed * _OWNER_MIX) >> 64) % workers
+
+
+def _hdaWorker(conn, queues, index, workers, width, heuristic, goal_string, timed=False):
+   # one hdastar worker: owns the states that hash to index, and keeps their best known cost,
+   # parent and open list.  States generated for other workers are put straight on their
+   # queues[owner], one batch per owner per round.  The coordinator drives the rounds over conn,
+   # telling the worker how many batches wait on its own queue.  With timed, the time spent on
+   # heuristic values is added up in stats['heuristic_time'].
+   board_class = puzz.board_class(width)
+   goal = board_class(goal_string)
+   goal_packed = goal.packed()
+   table = heuristicTable(heuristic, goal)
+   move_table = board_class.MOVE_TABLE
+   bits = board_class.BITS
+   mask = (1 << bits) - 1
+   best = {}  # packed state: [g, parent packed state, parent blank, move]
+   open_list = []  # heap of (f, count, g, h, packed state, blank)
+   counter = itertools.count()
+   stats = {'expanded': 0, 'generated': 0, 'sent': 0, 'received': 0, 'improved': 0,
+            'states': 0, 'peak_open': 0, 'heuristic_time': 0.0}
+
+   def offer(g, h, packed, blank, parent, parent_blank, move, bound):
+       entry = best.get(packed)
+       if entry is not None and entry[0] <= g:
+           return
+       if entry is None:
+           stats['states'] += 1
+       else:  # a cheaper path to a known state; it is expanded again
+           stats['improved'] += 1
+       best[packed] = [g, parent, parent_blank, move]
+       if bound is None or g + h < bound:
+           heapq.heappush(open_list, (g + h, next(counter), g, h, packed, blank))
+
+   while True:
+       message = conn.recv()
+       if message[0] == 'parent':
+           conn.send(best[message[1]][1:])
+           continue
+       if message[0] == 'stop':
+           conn.send(stats)
+           return
+       _, batches, bound, limit = message
+       for _ in range(batches):
+           inbox = queues[index].get()
+           stats['received'] += len(inbox)
+           for item in inbox:
+               offer(*item, bound)
+       outboxes = [[] for _ in range(workers)]
+       goal_cost = None
+       expanded = 0
+       while open_list and expanded < limit:
+           f, _, g, h, packed, blank = heapq.heappop(open_list)
+           if best[packed][0] < g:  # a cheaper path was found after this entry was queued
+               continue
+           if bound is not None and f >= bound:  # nothing left here can beat the incumbent
+               open_list = []
+               break
+           if packed == goal_packed:
+               goal_cost = g
+               bound = g
+               continue
+           expanded += 1
+           for move, pos in move_table[blank]:
+               shift = pos * bits
+               tile = (packed >> shift) & mask
+               succ = packed + (tile << (blank * bits)) - (tile << shift)
+               cost = g + tile ** 2
+               if timed:
+                   start_time = time.perf_counter()
+               if heuristic == 'h4':
+                   succ_h = slideLinearConflict(h, board_class.from_packed(succ, pos), tile, pos,
+                                                blank, goal)
+               elif table is None:
+                   succ_h = calculateHeuristic(heuristic, board_class.from_packed(succ, pos), goal)
+               else:
+                   succ_h = slideHeuristic(table, h, tile, pos, blank)
+               if timed:
+                   stats['heuristic_time'] += time.perf_counter() - start_time
+               stats['generated'] += 1
+               if succ == goal_packed:
+                   if goal_cost is None or cost < goal_cost:
+                       goal_cost = cost
+                   if bound is None or cost < bound:
+                       bound = cost
+               elif bound is not None and cost + succ_h >= bound:
+                   continue
+               owner = stateOwner(succ, workers)
+               item = (cost, succ_h, succ, pos, packed, blank, move)
+               if owner == index:
+                   offer(*item, bound)
+               else:
+                   outboxes[owner].append(item)
+                   stats['sent'] += 1
+       stats['expanded'] += expanded
+       stats['peak_open'] = max(stats['peak_open'], len(open_list))
+       sent_to = [owner for owner, outbox in enumerate(outboxes) if outbox]
+       for owner in sent_to:
+           queues[owner].put(outboxes[owner])
+       # the lowest f of the states this worker holds, open or just sent off
+       open_f = [g + h for owner in sent_to for g, h, *_ in outboxes[owner]]
+       if open_list:
+           open_f.append(open_list[0][0])
+       min_f = min(open_f) if open_f else None
+       in_flight = sum(len(outboxes[owner]) for owner in sent_to)
+       conn.send((sent_to, min_f, goal_cost, expanded, len(open_list) + in_flight, len(best)))
+
+
+def hdastar(start_state, heuristic, results, goal=GOAL_STATE, workers=None, telemetry=None):
+   # hash-distributed A*: every state belongs to the worker process chosen by stateOwner(), which
+   # keeps its cost and parent and expands it.  Each round, every worker takes in the states sent
+   # to it, expands up to HDA_ROUND_EXPANSIONS of its own best states and puts the states it
+   # generated for other workers on their queues.  Workers expand states out of A* order, but a
+   # cheaper path to a state reopens it, and the search ends only once no open or in-flight state
+   # can beat the cheapest goal path found, so the path is still optimal.  The coordinator only
+   # tells each worker how many batches to take in and watches for that end.  A single worker
+   # runs on a thread instead of a process, which also lets solve_many()'s pool workers
+   # (daemonic processes may not start children) use hdastar.
+   workers = workers or os.cpu_count() or 1
+   if workers == 1:
+       queues = [queue.Queue()]
+   else:
+       queues = [multiprocessing.Queue() for _ in range(workers)]
+   conns = []
+   processes = []
+   for index in range(workers):
+       parent_conn, child_conn = multiprocessing.Pipe()
+       args = (child_conn, queues, index, workers, start_state.WIDTH, heuristic, str(goal),
+               telemetry is not None)
+       if workers == 1:
+           process = threading.Thread(target=_hdaWorker, args=args, daemon=True)
+       else:
+           process = multiprocessing.Process(target=_hdaWorker, args=args, daemon=True)
+       process.start()
+       conns.append(parent_conn)
+       processes.append(process)
+
+   try:
+       start_packed = start_state.packed()
+       start_h = calculateHeuristic(heuristic, start_state, goal)
+       start_owner = stateOwner(start_packed, workers)
+       queues[start_owner].put([(0, start_h, start_packed, start_state.blank_pos(), None, None,
+                                 None)])
+       batches = [0] * workers  # batches waiting on each worker's queue
+       batches[start_owner] = 1
+       incumbent = None  # cost of the cheapest goal path found so far
+       done = False
+       while not done:
+           for conn, count in zip(conns, batches):
+               conn.send(('round', count, incumbent, HDA_ROUND_EXPANSIONS))
+           batches = [0] * workers
+           open_f = []
+           round_expanded = open_size = owned = 0
+           for conn in conns:
+               sent_to, min_f, goal_cost, expanded, open_count, state_count = conn.recv()
+               for owner in sent_to:
+                   batches[owner] += 1
+               if min_f is not None:
+                   open_f.append(min_f)
+               if goal_cost is not None and (incumbent is None or goal_cost < incumbent):
+                   incumbent = goal_cost
+               round_expanded += expanded
+               open_size += open_count
+               owned += state_count
+           if telemetry is not None:  # the frontier includes the states in flight
+               telemetry.on_batch(round_expanded, open_size, owned)
+           # stop once nothing open or in flight can lead to a cheaper goal path; the in-flight
+           # states still get one last round (with no expansions) so that parents are recorded
+           lowest = min(open_f) if open_f else None
+           if lowest is None or (incumbent is not None and lowest >= incumbent):
+               if any(batches):  # deliver what is still in flight before tracing the path
+                   for conn, count in zip(conns, batches):
+                       conn.send(('round', count, incumbent, 0))
+                   for conn in conns:
+                       conn.recv()
+               done = True
+
+       if incumbent is not None:
+           # follow parents back from the goal, asking each state's owner
+           path = []
+           packed, blank = goal.packed(), goal.blank_pos()
+           while packed != start_packed:
+               conns[stateOwner(packed, workers)].send(('parent', packed))
+               parent, parent_blank, move = conns[stateOwner(packed, workers)].recv()
+               path.append((move, type(start_state).from_packed(packed, blank)))
+               packed, blank = parent, parent_blank
+           path.append(('start', start_state))
+           path.reverse()
+           results['path'] = path
+           results['path_cost'] = incumbent
+       else:
+           del results['path']
+           del results['path_cost']
+
+       worker_stats = []
+       for conn in conns:
+           conn.send(('stop',))
+           worker_stats.append(conn.recv())
+   finally:
+       for process in processes:
+           process.join(timeout=1)
+           if process.is_alive() and workers > 1:  # threads can't be stopped; they are daemons
+               process.terminate()
+
+   if telemetry is not None:
+       telemetry.on_reprioritize(sum(stats['improved'] for stats in worker_stats))
+       telemetry.on_heuristic(sum(stats['heuristic_time'] for stats in worker_stats),
+                              sum(stats['generated'] for stats in worker_stats))
+   results['frontier_count'] = sum(stats['states'] for stats in worker_stats)
+   results['expanded_count'] = sum(stats['expanded'] for stats in worker_stats)
+   results['workers'] = worker_stats
+   return results
+
+
+def vastar(start_state, heuristic, results, goal=GOAL_STATE, telemetry=None):
+   # A* that expands every lowest-f state at once with NumPy (see vsearch.py).  NumPy is only
+   # needed for these strategies, so it is imported here rather than at the top
+   try:
+       import numpy  # noqa: F401
+   except ImportError:
+       raise ImportError("the vastar strategies need NumPy (pip install numpy)") from None
+   import vsearch
+   if not isinstance(start_state, puzz.EightPuzzleBoard):
+       raise ValueError("the vastar strategies only support 3x3 boards")
+   if heuristic == 'pdb':
+       batch_heuristic = vsearch.BatchHeuristic(pattern_db=patterndb.load_additive(
+           goal, 3, 3, patterndb.default_patterns(goal.SIZE)))
+   else:
+       batch_heuristic = vsearch.BatchHeuristic(heuristicTable(heuristic, goal))
+   return vsearch.vastar(start_state, goal, results, batch_heuristic, telemetry)
+
+
+def table(start_state, results, goal=GOAL_STATE):
+   if isinstance(start_state, puzz.EightPuzzleBoard):
+       cost_table = costtable.load_table(goal, calculateCost)  # built on first use
+   else:  # bigger boards need a table built beforehand by extbfs.py
+       cost_table = extbfs.load_table(goal)
+   path = cost_table.walk(start_state, goal)
+   if path is None:
+       del results['path']
+       del results['path_cost']
+       return results
+   results['path'] = path
+   results['path_cost'] = cost_table.cost(start_state)
+   return results
+
+
+def solve_puzzle(start_state, strategy, queue='heap', instrument=False, callback=None,
+                 callback_every=1000, verbose=False, goal=None, deadline=None,
+                 max_expansions=None, cache=None, workers=None):
    """Perform a search to find a solution to a puzzle.
 
    Args:
-       start_state: an EightPuzzleBoard object indicating the start state for the search
+       start_state: a puzz board object (EightPuzzleBoard, FifteenPuzzleBoard, ...) indicating
+           the start state for the search
        flavor: a string indicating which type of search to run.  Can be one of the following:
            'bfs' - breadth-first search
            'ucost' - uniform-cost search
+           'bi-ucost' - bidirectional uniform-cost search (from the start and from the goal)
            'greedy-h1' - Greedy best-first search using a misplaced tile count heuristic
            'greedy-h2' - Greedy best-first search using a Manhattan distance heuristic
            'greedy-h3' - Greedy best-first search using a weighted Manhattan distance heuristic
+           'greedy-h4' - Greedy best-first search using weighted Manhattan distance plus weighted
+               linear conflicts
            'astar-h1' - A* search using a misplaced tile count heuristic
            'astar-h2' - A* search using a Manhattan distance heuristic
            'astar-h3' - A* search using a weighted Manhattan distance heuristic
+           'astar-h4' - A* search using weighted Manhattan distance plus weighted
+               linear conflicts
+           'astar-pdb' - A* search using additive weighted pattern databases (tiles 1-4, 5-8)
+           'idastar-h3' - IDA* search using a weighted Manhattan distance heuristic
+           'idastar-h4' - IDA* search using weighted Manhattan distance plus weighted
+               linear conflicts
+           'idastar-pdb' - IDA* search using additive weighted pattern databases
+           'anytime-h1', 'anytime-h2', 'anytime-h3', 'anytime-pdb' - anytime weighted A* (ARA*):
+               finds a path quickly with the heuristic weighted by ANYTIME_WEIGHTS, then keeps
+               lowering the weight by ANYTIME_STEP and improving the path, reusing the search so
+               far, until it is proven optimal or the deadline/max_expansions budget runs out
+           'hdastar-h1', 'hdastar-h2', 'hdastar-h3', 'hdastar-pdb' - hash-distributed parallel
+               A*: states are spread over worker processes by a hash of their packed encoding,
+               and each worker expands the states it owns
+           'anytime-h4', 'hdastar-h4' - the two searches above using h4
+           'beam-h2:W', 'beam-h3:W' (or any other heuristic) - beam search keeping the W states
+               with the lowest f = g + h in each depth layer (W defaults to BEAM_WIDTH).  Fast
+               and O(W * depth) in memory, but the path may not be optimal, or found at all.
+           'vastar-h1', 'vastar-h2', 'vastar-h3', 'vastar-pdb' - A* that pops every state
+               with the lowest f at once and expands the batch with vectorized NumPy operations.
+               3x3 boards only, and needs NumPy.
+           'table' - walk a precomputed table of optimal moves (no search; the counts stay 0).
+               3x3 tables are built on first use; larger boards need one built by extbfs.py,
+               and boards outside it are not solved.
+           The strategies in OPTIMAL_STRATEGIES ('ucost', 'bi-ucost', 'astar-h3', 'astar-h4',
+           'astar-pdb', 'idastar-h3', 'idastar-h4', 'idastar-pdb', 'hdastar-h3', 'hdastar-h4',
+           'hdastar-pdb', 'vastar-h3', 'vastar-pdb' and 'table') always return a cheapest path.
+       queue: which pdqpq frontier the searches use: 'heap' (PriorityQueue), 'bucket'
+           (BucketPriorityQueue, amortized O(1) for the integer priorities used here) or
+           'indexed' (IndexedPriorityQueue, a d-ary heap with in-place decrease-key)
+       instrument: if True, add a 'telemetry' entry to the results (see below)
+       callback: optional function called with a telemetry snapshot (the same dictionary as the
+           'telemetry' entry) every callback_every expansions
+       callback_every: expansions between callback calls
+       verbose: if True, print whether a solution was found
+       goal: the goal board (or board string) to solve toward; defaults to the standard goal
+           board of the same size as start_state (GOAL_STATE for 3x3).  Lookup tables for each
+           goal are built on first use and cached (see goalTables()).
+       deadline: for the anytime strategies, seconds (from the start of this call) after which
+           the best path found so far is returned; beam searches give up at the deadline
+       max_expansions: for the anytime strategies, the number of expansions after which the best
+           path found so far is returned; beam searches give up after this many
+       workers: for the hdastar strategies, the number of worker processes (defaults to the
+           number of CPUs)
+       cache: optional solcache.SolutionCache for the same goal.  Optimal paths found by the
+           strategies in OPTIMAL_STRATEGIES (or by an anytime search that proved its path
+           optimal) are added to it, and the astar strategies stop as soon as they reach a
+           cached state, finishing with the cached path from there.
 
    Returns:
        A dictionary containing describing the search performed, containing the following entries:
            'path' - a list of 2-tuples representing the path from the start state to the goal state
-               (both should be included), with each entry being a (str, EightPuzzleBoard) pair
+               (both should be included), with each entry being a (str, board) pair
                indicating the move and resulting state for each action.  Omitted if the search
                fails.
            'path_cost' - the total cost of the path, taking into account the costs associated
@@ -263,8 +1200,27 @@ def solve_puzzle(start_state, strategy):
                point during the search.
            'expanded_count' - the number of unique states removed from the frontier and expanded
                (successors generated).
+           'suboptimality_bound' - anytime strategies only: the path cost is proven to be at most
+               this many times the optimal cost (1.0 means optimal).  Omitted if no path was
+               found within the budget.
+           'cache_hits', 'cache_misses' - only with a cache: lookups during this search that
+               found / did not find a cached solution.
+           'workers' - hdastar only: a list with a dictionary of statistics for each worker:
+               'expanded', 'generated', 'sent' and 'received' (states handed to and from other
+               workers), 'improved' (cheaper paths found to known states), 'states' (states
+               owned), 'peak_open' (largest open list) and 'heuristic_time' (seconds spent on
+               heuristic values; only measured with instrument=True or a callback).
+           'reason' - only present when no search was run because the board cannot reach the
+               goal: 'unsolvable'.
+           'telemetry' - only with instrument=True: a dictionary with 'wall_time' (seconds),
+               'expanded', 'nodes_per_second', 'peak_frontier', 'peak_state_info' (largest
+               frontier and state table seen), 'heuristic_time' (seconds spent evaluating the
+               heuristic), 'heuristic_calls' and 'reprioritized' (frontier entries whose priority
+               was lowered).  hdastar reports its workers' totals once per round, counting the
+               states in flight between workers as frontier, and vastar reports once per batch.
    """
 
+   stop_time = None if deadline is None else time.perf_counter() + deadline
    results = {
        'path': [],
        'path_cost': 0,
@@ -272,17 +1228,69 @@ def solve_puzzle(start_state, strategy):
        'expanded_count': 0,
    }
 
-   if strategy == 'bfs':  # breadth-first
-       results = bfs(start_state, results)
+   if goal is None:
+       goal = defaultGoal(start_state)
+   elif isinstance(goal, str):
+       goal = puzz.make_board(goal)
+   if type(goal) is not type(start_state):
+       raise ValueError("goal {} is not the same size as the start board {}".format(goal,
+                                                                                  start_state))
+   if cache is not None and cache.goal != goal:
+       raise ValueError("the solution cache is for goal {}, not {}".format(cache.goal, goal))
+   if cache is not None:
+       hits, misses = cache.hits, cache.misses
+   frontier_class = QUEUES[queue]
+   search, _, heuristic = strategy.partition('-')
+   telemetry = None
+   if instrument or callback is not None:
+       telemetry = search_telemetry.SearchTelemetry(callback, callback_every)
+
+   if not sameParity(start_state, goal):  # different parity, so no search can succeed
+       del results['path']
+       del results['path_cost']
+       results['reason'] = 'unsolvable'
+   elif strategy == 'bfs':  # breadth-first
+       results = bfs(start_state, results, goal, frontier_class, telemetry)
    elif strategy == 'ucost':  # uniform cost
-       results = ucost(start_state, results)
-   elif strategy[:-3] == 'greedy':  # greedy best-first
-       results = greedy(start_state, strategy[-2:], results)
-   elif strategy[:-3] == 'astar':  # astar
-       results = astar(start_state, strategy[-2:], results)
+       results = ucost(start_state, results, goal, frontier_class, telemetry)
+   elif strategy == 'bi-ucost':  # bidirectional uniform cost
+       results = biucost(start_state, results, goal, frontier_class, telemetry)
+   elif search == 'greedy' and heuristic in HEURISTICS:  # greedy best-first
+       results = greedy(start_state, heuristic, results, goal, frontier_class, telemetry)
+   elif search == 'astar' and heuristic in HEURISTICS:  # astar
+       results = astar(start_state, heuristic, results, goal, frontier_class, telemetry, cache)
+   elif search == 'idastar' and heuristic in IDASTAR_HEURISTICS:  # iterative-deepening astar
+       results = idastar(start_state, heuristic, results, goal, telemetry)
+   elif search == 'anytime' and heuristic in HEURISTICS:  # anytime weighted astar (ARA*)
+       results = anytime(start_state, heuristic, results, goal, frontier_class, telemetry,
+                         stop_time=stop_time, max_expansions=max_expansions)
+   elif search == 'hdastar' and heuristic in HEURISTICS:  # parallel hash-distributed astar
+       results = hdastar(start_state, heuristic, results, goal, workers, telemetry)
+   elif (search == 'beam' and heuristic.partition(':')[0] in HEURISTICS
+         and beamWidth(heuristic) is not None):  # beam search
+       results = beam(start_state, heuristic.partition(':')[0], beamWidth(heuristic), results,
+                      goal, telemetry, stop_time, max_expansions)
+   elif search == 'vastar' and heuristic in VASTAR_HEURISTICS:  # batch-expanding astar (NumPy)
+       results = vastar(start_state, heuristic, results, goal, telemetry)
+   elif strategy == 'table':  # precomputed optimal moves
+       results = table(start_state, results, goal)
    else:
        del results['path']
        del results['path_cost']
+
+   if cache is not None:
+       if 'path' in results and (strategy in OPTIMAL_STRATEGIES or
+                                 results.get('suboptimality_bound') == 1.0):
+           cache.add_path(results['path'], calculateCost)
+       results['cache_hits'] = cache.hits - hits
+       results['cache_misses'] = cache.misses - misses
+
+   if telemetry is not None:
+       telemetry.finish()
+       if instrument:
+           results['telemetry'] = telemetry.snapshot()
+   if verbose:
+       print('solution found' if 'path' in results else 'no solution found')
    return results
 
 
@@ -298,12 +1306,147 @@ def print_summary(results):
                                                                    results['expanded_count']))
 
 
+def _solve_one(job):
+   # worker for solve_many(): solve one board and describe it with plain JSON-friendly types
+   index, board, strategy, queue, goal, workers = job
+   start_time = time.time()
+   results = solve_puzzle(puzz.make_board(board), strategy, queue, goal=goal, workers=workers)
+   record = {
+       'index': index,
+       'board': board,
+       'strategy': strategy,
+       'frontier_count': results['frontier_count'],
+       'expanded_count': results['expanded_count'],
+       'wall_time': time.time() - start_time,
+   }
+   if 'path' in results:
+       record['path'] = [[move, str(state)] for move, state in results['path']]
+       record['path_cost'] = results['path_cost']
+   if 'reason' in results:
+       record['reason'] = results['reason']
+   return record
+
+
+def solve_many(boards, strategy, workers=None, ordered=True, chunksize=1, queue='heap',
+               goal=None):
+   """Solve a batch of puzzles in parallel, yielding a result record for each as it finishes.
+
+   Args:
+       boards: iterable of puzz board objects or board strings (any supported size)
+       strategy: search strategy name, as accepted by solve_puzzle()
+       workers: number of worker processes (defaults to the number of CPUs); with 1, the boards
+           are solved in this process.  hdastar strategies search each board with one worker.
+       ordered: if True, records come back in input order; otherwise in completion order
+       chunksize: number of boards handed to a worker at a time
+       queue: frontier type, as accepted by solve_puzzle()
+       goal: goal board or board string for every board (defaults to the standard goal of each
+           board's size)
+
+   Yields: dictionaries with the entries 'index' (position in boards), 'board', 'strategy',
+       'frontier_count', 'expanded_count' and 'wall_time' (seconds), plus 'path' (a list of
+       [move, board string] pairs) and 'path_cost' when a solution was found, or 'reason' when
+       the board was rejected as unsolvable.  Unsolvable boards are rejected without searching;
+       to drop them before they are even sent to a worker, filter boards with is_solvable().
+   """
+   goal = None if goal is None else str(goal)
+   # the boards are already spread over the pool, so each hdastar search gets a single worker
+   jobs = ((index, str(board), strategy, queue, goal, 1) for index, board in enumerate(boards))
+   if workers == 1:
+       for job in jobs:
+           yield _solve_one(job)
+       return
+   with multiprocessing.Pool(workers) as pool:
+       mapper = pool.imap if ordered else pool.imap_unordered
+       for record in mapper(_solve_one, jobs, chunksize):
+           yield record
+
+
+def skipUnsolvable(boards, goal=None):
+   # pass solvable boards through, reporting the others on stderr
+   for board in boards:
+       if is_solvable(board, goal):
+           yield board
+       else:
+           print("skipping unsolvable board {}".format(board), file=sys.stderr)
+
+
+def read_boards(stream):
+   # one board string per line; blank lines are skipped
+   for line in stream:
+       line = line.strip()
+       if line:
+           yield line
+
+
 ############################################
 
 if __name__ == '__main__':
-   start = puzz.EightPuzzleBoard(sys.argv[1])
-   method = sys.argv[2]
-
-   print("solving puzzle {} -> {}".format(start, GOAL_STATE))
-   results = solve_puzzle(start, method)
-   print_summary(results)
+   parser = argparse.ArgumentParser()
+   parser.add_argument('board', nargs='?', help="board to solve (leave out when using --batch)")
+   parser.add_argument('method')
+   parser.add_argument('--batch', metavar='FILE',
+                       help="solve every board in FILE ('-' for stdin), printing JSON lines")
+   parser.add_argument('--workers', type=int,
+                       help="worker processes for --batch or hdastar-* (with --batch, each "
+                            "hdastar-* search uses one worker)")
+   parser.add_argument('--order', choices=['input', 'completion'], default='input',
+                       help="order of --batch results")
+   parser.add_argument('--queue', choices=sorted(QUEUES), default='heap',
+                       help="frontier priority queue")
+   parser.add_argument('--stats', action='store_true', help="print search telemetry")
+   parser.add_argument('--skip-unsolvable', action='store_true',
+                       help="leave unsolvable boards out of --batch (listed on stderr instead)")
+   parser.add_argument('--goal', help="goal board (default: the standard goal for the size)")
+   parser.add_argument('--deadline', type=float,
+                       help="seconds allowed for anytime-*/beam-* searches")
+   parser.add_argument('--max-expansions', type=int,
+                       help="expansions allowed for anytime-*/beam-*")
+   parser.add_argument('--cache', metavar='FILE',
+                       help="solution cache file to use and update (created if missing)")
+   parser.add_argument('--table-dir',
+                       help="directory for cost tables and pattern databases (default: "
+                            "$PUZZLE_TABLE_DIR, or the directory of this code)")
+   args = parser.parse_args()
+   if args.table_dir:
+       tablefiles.set_table_dir(args.table_dir)
+
+   if args.batch:
+       stream = sys.stdin if args.batch == '-' else open(args.batch)
+       with stream:
+           boards = read_boards(stream)
+           if args.skip_unsolvable:
+               boards = skipUnsolvable(boards, args.goal)
+           for record in solve_many(boards, args.method, workers=args.workers,
+                                    ordered=(args.order == 'input'), queue=args.queue,
+                                    goal=args.goal):
+               print(json.dumps(record), flush=True)
+   else:
+       if args.board is None:
+           parser.error("a board is required unless --batch is given")
+       start = puzz.make_board(args.board)
+       goal = defaultGoal(start) if args.goal is None else puzz.make_board(args.goal)
+       cache = None
+       if args.cache:
+           if os.path.exists(args.cache):
+               cache = solcache.SolutionCache.load(args.cache)
+           else:
+               cache = solcache.SolutionCache(goal)
+       print("solving puzzle {} -> {}".format(start, goal))
+       results = solve_puzzle(start, args.method, args.queue, instrument=args.stats, goal=goal,
+                              deadline=args.deadline, max_expansions=args.max_expansions,
+                              cache=cache, workers=args.workers)
+       if cache is not None:
+           cache.save(args.cache)
+           print("cache: {} hits, {} misses, {} states".format(results['cache_hits'],
+                                                               results['cache_misses'],
+                                                               len(cache)))
+       print_summary(results)
+       if 'suboptimality_bound' in results:
+           print("cost is within {:.3f}x of optimal".format(results['suboptimality_bound']))
+       if 'reason' in results:
+           print("({})".format(results['reason']))
+       if args.stats:
+           for name, value in results['telemetry'].items():
+               print("  {:18} {}".format(name, value))
+           for index, stats in enumerate(results.get('workers', [])):
+               print("  worker {}: {}".format(index, stats))
@@ -0,0 +1,186 @@
+"""Bookkeeping for the states a search has seen: closed set, parents, path costs and h values.
+
+Searches refer to states by a key from key(board), and their frontiers hold those keys.  There
+are two implementations with the same interface:
+
+    DictStateTable - keys are the boards themselves, with a set for the closed states and a dict
+        of [parent, direction, cost, h] lists.  Works for any board size.
+    RankStateTable - 3x3 boards only.  Keys are permutation ranks (see EightPuzzleBoard.rank), and
+        everything lives in flat arrays indexed by rank: a bitset for the closed states, one byte
+        for the move that reached each state, and arrays of costs and h values.  Boards are
+        rebuilt from their ranks (puzz.unrank), and parents are not stored; paths are rebuilt by
+        undoing moves backward from the end.
+
+The rank arrays take a few megabytes, but a full 3x3 search needs a fraction of the memory a dict
+of lists does, and its keys are plain ints.  They are allocated once per process: when a table is
+garbage collected it clears just the ranks it recorded and leaves its arrays for the next table,
+so short searches don't pay for allocating and filling the whole state space.
+
+"""
+import array
+
+import puzz
+
+MOVE_INDEX = {move: i for i, move in enumerate(puzz.MOVES)}
+START = len(puzz.MOVES)  # move byte for the start state
+UNSEEN = 255  # move byte for states not recorded yet
+MAX_FREE_ARRAYS = 2  # spare RankStateTable array sets kept (bi-ucost uses two tables at once)
+
+_free_arrays = []  # (moves, closed, costs, h) arrays left by finished tables, already cleared
+
+
+def for_board(board):
+    """Return an empty state table suited to a board's size."""
+    if isinstance(board, puzz.EightPuzzleBoard):
+        return RankStateTable()
+    return DictStateTable()
+
+
+class DictStateTable:
+    """State table keyed by board objects, for boards of any size."""
+
+    def __init__(self):
+        self._info = {}  # board: [parent, direction, cost, h]
+        self._closed = set()
+
+    def key(self, board):
+        return board
+
+    def board(self, key):
+        return key
+
+    def record(self, key, board, parent, direction, cost, h=0):
+        """Set (or replace) how a state was reached.
+
+        Args:
+            key: the state's key
+            board: the state's board
+            parent: key of the state it was reached from (None for the start)
+            direction: the move that reached it (None for the start)
+            cost: path cost from the start
+            h: heuristic value, for searches that use one
+        """
+        self._info[key] = [parent, direction, cost, h]
+
+    def cost(self, key):
+        return self._info[key][2]
+
+    def h(self, key):
+        return self._info[key][3]
+
+    def parent(self, key):
+        """Return the (parent key, direction) a recorded state was reached by."""
+        info = self._info[key]
+        return info[0], info[1]
+
+    def close(self, key):
+        self._closed.add(key)
+
+    def is_closed(self, key):
+        return key in self._closed
+
+    def reopen(self, key=None):
+        """Take a state (by default, every state) out of the closed set, keeping everything else
+        that was recorded."""
+        if key is None:
+            self._closed = set()
+        else:
+            self._closed.discard(key)
+
+    def path(self, start, end):
+        """Return the path from start to end as a list of (direction, board) pairs.
+
+        The first entry is ('start', start board), as with solver.findpath().
+        """
+        steps = []
+        while end != start:
+            parent, direction = self.parent(end)
+            steps.append((direction, self.board(end)))
+            end = parent
+        steps.append(('start', self.board(start)))
+        steps.reverse()
+        return steps
+
+    def __contains__(self, key):
+        return key in self._info
+
+    def __len__(self):
+        return len(self._info)
+
+
+class RankStateTable(DictStateTable):
+    """State table for 3x3 boards, keyed by permutation rank and stored in flat arrays.
+
+    Only boards reachable from one another are ever recorded in the same table (a search never
+    leaves the start board's solvability class), so their ranks never collide.
+    """
+
+    def __init__(self):
+        if _free_arrays:
+            self._moves, self._closed, self._costs, self._h = _free_arrays.pop()
+        else:
+            self._moves = bytearray([UNSEEN]) * puzz.NUM_RANKS
+            self._closed = bytearray((puzz.NUM_RANKS + 7) >> 3)
+            self._costs = array.array('I', [0]) * puzz.NUM_RANKS
+            self._h = array.array('I', [0]) * puzz.NUM_RANKS
+        self._recorded = array.array('I')  # the ranks to clear afterwards
+        self._parity = 0  # which of the two boards sharing each rank this table holds
+
+    def __del__(self):
+        # clear the ranks this table used and leave its arrays for the next table; after a big
+        # search it is about as quick to allocate new ones
+        if len(_free_arrays) >= MAX_FREE_ARRAYS or len(self._recorded) > puzz.NUM_RANKS // 8:
+            return
+        moves, closed = self._moves, self._closed
+        for key in self._recorded:
+            moves[key] = UNSEEN
+            closed[key >> 3] = 0
+        _free_arrays.append((moves, closed, self._costs, self._h))
+
+    def key(self, board):
+        return board.rank()
+
+    def board(self, key):
+        return puzz.unrank(key, self._parity)
+
+    def record(self, key, board, parent, direction, cost, h=0):
+        # the parent is implied by the direction, so it is not stored
+        if self._moves[key] == UNSEEN:
+            if not self._recorded:
+                self._parity = board.parity()
+            self._recorded.append(key)
+        self._moves[key] = START if direction is None else MOVE_INDEX[direction]
+        self._costs[key] = cost
+        self._h[key] = h
+
+    def cost(self, key):
+        return self._costs[key]
+
+    def h(self, key):
+        return self._h[key]
+
+    def parent(self, key):
+        direction = puzz.MOVES[self._moves[key]]
+        # sliding the same tile back the opposite way gives the parent board
+        parent = self.board(key).successors()[puzz.OPPOSITE_MOVE[direction]]
+        return parent.rank(), direction
+
+    def close(self, key):
+        self._closed[key >> 3] |= 1 << (key & 7)
+
+    def is_closed(self, key):
+        return (self._closed[key >> 3] >> (key & 7)) & 1
+
+    def reopen(self, key=None):
+        if key is None:
+            closed = self._closed
+            for key in self._recorded:
+                closed[key >> 3] = 0
+        else:
+            self._closed[key >> 3] &= ~(1 << (key & 7))
+
+    def __contains__(self, key):
+        return self._moves[key] != UNSEEN
+
+    def __len__(self):
+        return len(self._recorded)
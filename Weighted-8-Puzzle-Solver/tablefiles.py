@@ -0,0 +1,62 @@
+"""Where precomputed tables are stored, and how many goals' tables are kept loaded.
+
+Cost tables, pattern databases and external tables are saved in table_dir(): the directory named
+by the PUZZLE_TABLE_DIR environment variable, or the directory of this code if it is not set.
+set_table_dir() sets the variable, so worker processes started afterwards use the same directory.
+
+Loaded tables are kept in GoalCache objects, which drop the least recently used entry once more
+than GOAL_CACHE_SIZE goals are loaded.  Dropped tables are read from disk again when needed.
+
+"""
+import collections
+import os
+
+TABLE_DIR_VARIABLE = 'PUZZLE_TABLE_DIR'
+GOAL_CACHE_SIZE = 32  # goals whose tables are kept loaded (least recently used are dropped)
+
+
+def table_dir():
+    """Return the directory table files are read from and written to (created if needed)."""
+    path = os.environ.get(TABLE_DIR_VARIABLE)
+    if not path:
+        return os.path.dirname(os.path.abspath(__file__))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def set_table_dir(path):
+    """Store table files in path from now on, in this process and any it starts."""
+    os.environ[TABLE_DIR_VARIABLE] = os.path.abspath(path)
+
+
+class GoalCache:
+    """Least recently used cache of loaded tables, keyed by goal.
+
+    Args:
+        max_entries: the most tables kept before the least recently used is dropped
+    """
+
+    def __init__(self, max_entries=GOAL_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+
+    def get(self, key):
+        """Return the table stored under key (marking it recently used), or None."""
+        table = self._entries.get(key)
+        if table is not None:
+            self._entries.move_to_end(key)
+        return table
+
+    def put(self, key, table):
+        """Store a table under key, dropping the least recently used one if the cache is full."""
+        self._entries[key] = table
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key):
+        """Forget the table stored under key, if any."""
+        self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,92 @@
+"""Opt-in instrumentation for the searches in solver.py.
+
+A SearchTelemetry object is handed to a search function, which reports each expansion (with the
+current frontier and state-table sizes) and each re-prioritized frontier entry to it.  Searches
+that expand states in batches or in other processes report them in bulk with on_batch().  Heuristic
+functions can be wrapped with timed() to measure the time spent evaluating them.  Searches run
+without telemetry skip all of this, so it costs nothing unless asked for.
+
+"""
+import time
+
+
+class SearchTelemetry:
+    """Collects timing and size statistics for a single search.
+
+    Args:
+        callback: optional function called with a snapshot() dictionary every `every` expansions
+        every: how many expansions to wait between callback calls
+    """
+
+    def __init__(self, callback=None, every=1000):
+        self.callback = callback
+        self.every = every
+        self.start_time = time.perf_counter()
+        self.end_time = None
+        self.expanded = 0
+        self.peak_frontier = 0
+        self.peak_state_info = 0
+        self.heuristic_time = 0.0
+        self.heuristic_calls = 0
+        self.reprioritized = 0
+
+    def on_expand(self, frontier_size, state_info_size):
+        """Record one expansion, given the frontier and state table sizes after it."""
+        self.expanded += 1
+        if frontier_size > self.peak_frontier:
+            self.peak_frontier = frontier_size
+        if state_info_size > self.peak_state_info:
+            self.peak_state_info = state_info_size
+        if self.callback is not None and self.expanded % self.every == 0:
+            self.callback(self.snapshot())
+
+    def on_batch(self, expanded, frontier_size, state_info_size):
+        """Record several expansions made together (by a batch or parallel search), given the
+        frontier and state table sizes after them."""
+        before = self.expanded
+        self.expanded += expanded
+        if frontier_size > self.peak_frontier:
+            self.peak_frontier = frontier_size
+        if state_info_size > self.peak_state_info:
+            self.peak_state_info = state_info_size
+        if self.callback is not None and self.expanded // self.every > before // self.every:
+            self.callback(self.snapshot())
+
+    def on_reprioritize(self, count=1):
+        """Record frontier entries whose priority was lowered."""
+        self.reprioritized += count
+
+    def on_heuristic(self, seconds, calls):
+        """Record heuristic evaluations timed by the search itself (e.g. a whole batch at once)."""
+        self.heuristic_time += seconds
+        self.heuristic_calls += calls
+
+    def timed(self, func):
+        """Wrap a heuristic function so that its calls count toward heuristic_time."""
+        def timed_func(*args):
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.heuristic_time += time.perf_counter() - start
+                self.heuristic_calls += 1
+        return timed_func
+
+    def finish(self):
+        """Stop the wall clock."""
+        self.end_time = time.perf_counter()
+
+    def snapshot(self):
+        """Return the statistics collected so far as a dictionary."""
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        wall_time = end - self.start_time
+        return {
+            'wall_time': wall_time,
+            'expanded': self.expanded,
+            'nodes_per_second': self.expanded / wall_time if wall_time > 0 else 0.0,
+            'peak_frontier': self.peak_frontier,
+            'peak_state_info': self.peak_state_info,
+            'heuristic_time': self.heuristic_time,
+            'heuristic_calls': self.heuristic_calls,
+            'reprioritized': self.reprioritized,
+        }
@@ -0,0 +1,205 @@
+"""Batch-expanding A* for 3x3 boards, with the inner loop in NumPy.
+
+vastar() pops every frontier state with the lowest f at once and expands them together.  The
+boards are rows of a uint8 array; successors are built one move direction at a time with fancy
+indexing, step costs and heuristic values come from lookups into precomputed tables, and states
+are deduplicated by their permutation ranks (computed for the whole batch at once) against flat
+per-rank arrays of costs, frontier priorities and closed flags.  A closed state reached by a
+cheaper path is reopened.
+
+This module needs NumPy.  solver.py only imports it when a vastar strategy is used.
+
+"""
+import heapq
+import time
+
+import numpy as np
+
+import puzz
+
+RANK_WEIGHTS = np.array([2520, 360, 60, 12, 3, 1], dtype=np.int64)  # as in EightPuzzleBoard.rank
+_LATER = np.triu(np.ones((6, 8), dtype=bool), k=1)  # _LATER[i, j]: tile j comes after tile i
+NO_F = np.iinfo(np.int64).max  # frontier priority of states not on the frontier
+
+
+def _move_arrays():
+    # valid[m, blank] and source[m, blank]: whether move m is possible with the blank at blank,
+    # and the position of the tile that slides in
+    valid = np.zeros((len(puzz.MOVES), 9), dtype=bool)
+    source = np.zeros((len(puzz.MOVES), 9), dtype=np.int64)
+    for blank, moves in enumerate(puzz.MOVE_TABLE):
+        for move, pos in moves:
+            valid[puzz.MOVES.index(move), blank] = True
+            source[puzz.MOVES.index(move), blank] = pos
+    return valid, source
+
+
+VALID, SOURCE = _move_arrays()
+
+
+def ranks(boards):
+    """Return the permutation ranks (see EightPuzzleBoard.rank) of the rows of an (n, 9) array."""
+    blanks = np.argmin(boards, axis=1)
+    tiles = boards[boards != 0].reshape(-1, 8)
+    smaller_later = (tiles[:, None, :] < tiles[:, :6, None]) & _LATER
+    return blanks * puzz.BLANK_RANKS + smaller_later.sum(axis=2) @ RANK_WEIGHTS
+
+
+class BatchHeuristic:
+    """Vectorized heuristic: a per-tile table (h1/h2/h3) or an additive pattern database.
+
+    Args:
+        table: table[tile][pos] as from solver.heuristicTable(), or None
+        pattern_db: a patterndb.AdditivePatternDB, used when table is None
+    """
+
+    def __init__(self, table=None, pattern_db=None):
+        self.table = None if table is None else np.array(table, dtype=np.int64)
+        self.dbs = []
+        if table is None:
+            for db in pattern_db.dbs:
+                self.dbs.append((np.array(db.pattern), np.array(db.places, dtype=np.int64),
+                                 np.frombuffer(db.costs, dtype=np.uint16).astype(np.int64)))
+
+    def full(self, boards):
+        """Return the heuristic values of the rows of an (n, 9) array."""
+        if self.table is not None:
+            return self.table[boards, np.arange(9)].sum(axis=1)
+        where = np.argsort(boards, axis=1)  # where[:, tile] = position of tile
+        total = np.zeros(len(boards), dtype=np.int64)
+        for pattern, places, costs in self.dbs:
+            total += costs[where[:, pattern] @ places]
+        return total
+
+    def slide(self, h, boards, tiles, from_pos, to_pos):
+        """Return updated values after tiles moved from from_pos to to_pos (the rows of boards)."""
+        if self.table is None:
+            return self.full(boards)
+        t = self.table
+        return h + t[tiles, to_pos] - t[tiles, from_pos] + t[0, from_pos] - t[0, to_pos]
+
+
+def vastar(start_state, goal, results, heuristic, telemetry=None):
+    """A* search that expands all states with the lowest f in one batch.
+
+    Args:
+        start_state, goal: EightPuzzleBoard objects
+        results: the results dictionary from solver.solve_puzzle(), updated in place
+        heuristic: a BatchHeuristic
+        telemetry: optional telemetry.SearchTelemetry, given each batch's expansions and the
+            time spent on each batch's heuristic values
+
+    Returns: results, with 'path' and 'path_cost' removed if there is no solution
+    """
+    size = puzz.NUM_RANKS
+    boards = np.zeros((size, 9), dtype=np.uint8)
+    g = np.zeros(size, dtype=np.int64)
+    h = np.zeros(size, dtype=np.int64)
+    open_f = np.full(size, NO_F, dtype=np.int64)
+    closed = np.zeros(size, dtype=bool)
+    parent = np.full(size, -1, dtype=np.int64)
+    moves = np.zeros(size, dtype=np.int8)
+
+    start_rank = start_state.rank()
+    goal_rank = goal.rank()
+    boards[start_rank] = start_state.tiles()
+    h[start_rank] = heuristic.full(boards[start_rank:start_rank + 1])[0]
+    open_f[start_rank] = h[start_rank]
+    buckets = {int(h[start_rank]): [np.array([start_rank])]}  # f: arrays of ranks pushed at f
+    bucket_keys = [int(h[start_rank])]
+    results['frontier_count'] += 1
+
+    while bucket_keys:
+        f = heapq.heappop(bucket_keys)
+        batch = np.unique(np.concatenate(buckets.pop(f)))
+        batch = batch[(open_f[batch] == f) & ~closed[batch]]  # skip entries that were replaced
+        if batch.size == 0:
+            continue
+        if (batch == goal_rank).any():
+            results['path_cost'] = int(g[goal_rank])
+            results['path'] = _path(boards, parent, moves, start_rank, goal_rank)
+            return results
+        closed[batch] = True
+        open_f[batch] = NO_F
+        results['expanded_count'] += int(batch.size)
+
+        blanks = batch // puzz.BLANK_RANKS
+        parts = []
+        for move in range(len(puzz.MOVES)):
+            ok = VALID[move, blanks]
+            if not ok.any():
+                continue
+            from_ranks = batch[ok]
+            succs = boards[from_ranks]  # copies, since fancy indexing does not make views
+            blank = blanks[ok]
+            pos = SOURCE[move, blank]
+            rows = np.arange(len(succs))
+            tiles = succs[rows, pos]
+            succs[rows, blank] = tiles
+            succs[rows, pos] = 0
+            tiles = tiles.astype(np.int64)
+            succ_g = g[from_ranks] + tiles * tiles
+            if telemetry is not None:
+                start_time = time.perf_counter()
+            succ_h = heuristic.slide(h[from_ranks], succs, tiles, pos, blank)
+            if telemetry is not None:
+                telemetry.on_heuristic(time.perf_counter() - start_time, len(succs))
+            parts.append((succs, from_ranks, np.full(len(succs), move, dtype=np.int8),
+                          succ_g, succ_h))
+
+        if telemetry is not None:  # every state ever queued is in the flat arrays
+            telemetry.on_batch(int(batch.size),
+                               results['frontier_count'] - results['expanded_count'],
+                               results['frontier_count'])
+        succs, from_ranks, succ_moves, succ_g, succ_h = (np.concatenate(a) for a in zip(*parts))
+        succ_ranks = ranks(succs)
+        succ_f = succ_g + succ_h
+        # keep the cheapest copy of each state, then only states that improve on the frontier
+        order = np.lexsort((succ_f, succ_ranks))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = succ_ranks[order[1:]] != succ_ranks[order[:-1]]
+        keep = order[first]
+        # a cheaper path to a closed state reopens it, which keeps pattern databases (admissible
+        # but not consistent) optimal
+        keep_ranks = succ_ranks[keep]
+        keep = keep[np.where(closed[keep_ranks], succ_g[keep] < g[keep_ranks],
+                             succ_f[keep] < open_f[keep_ranks])]
+        if keep.size == 0:
+            continue
+        new_ranks = succ_ranks[keep]
+        reopened = closed[new_ranks]
+        closed[new_ranks] = False
+        added = int(((open_f[new_ranks] == NO_F) & ~reopened).sum())
+        results['frontier_count'] += added
+        if telemetry is not None:  # the others were already open at a higher f, or reopened
+            telemetry.on_reprioritize(len(new_ranks) - added)
+        boards[new_ranks] = succs[keep]
+        g[new_ranks] = succ_g[keep]
+        h[new_ranks] = succ_h[keep]
+        parent[new_ranks] = from_ranks[keep]
+        moves[new_ranks] = succ_moves[keep]
+        new_f = succ_f[keep]
+        open_f[new_ranks] = new_f
+        for value in np.unique(new_f):
+            value = int(value)
+            if value not in buckets:
+                buckets[value] = []
+                heapq.heappush(bucket_keys, value)
+            buckets[value].append(new_ranks[new_f == value])
+
+    del results['path']
+    del results['path_cost']
+    return results
+
+
+def _path(boards, parent, moves, start_rank, goal_rank):
+    # follow parents back from the goal, building solver.findpath()-style (move, board) pairs
+    path = []
+    rank = goal_rank
+    while rank != start_rank:
+        board = puzz.EightPuzzleBoard("".join(str(tile) for tile in boards[rank]))
+        path.append((puzz.MOVES[moves[rank]], board))
+        rank = parent[rank]
+    path.append(('start', puzz.EightPuzzleBoard("".join(str(t) for t in boards[start_rank]))))
+    path.reverse()
+    return path